@@ -1,6 +1,8 @@
 import sys
 import os
 
+import pytest
+
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
@@ -45,3 +47,13 @@ with open(filename, 'r') as f:
     assert file != default_md, (
         f'Не забудьте оформить `{filename}`'
     )
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Загрузки, миниатюры и варианты картинок пишутся во временный
+    # MEDIA_ROOT теста, а не в media проекта. Миниатюры готовятся при
+    # сохранении, а не в фоне после фиксации транзакции, чтобы потоки
+    # не писали в MEDIA_ROOT после завершения теста.
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.THUMBNAIL_WORKERS = 0
@@ -0,0 +1,56 @@
+from django.db.models import F
+from rest_framework import filters
+
+from posts.search import search
+from posts.tags import TAG_ORDERING
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Фильтр полнотекстового поиска по постам.
+
+    Использует полнотекстовый индекс постов вместо поиска по регулярному
+    выражению. Если параметр ordering не передан, найденные посты
+    сортируются по релевантности (при курсорной пагинации - по дате).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        queryset = search(queryset, ' '.join(terms))
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by('search_rank', '-pk')
+        return queryset
+
+
+class TagFilter(filters.BaseFilterBackend):
+    """
+    Фильтр постов по названию тега (параметр tag).
+
+    Посты тега находятся по индексу связей (tag, post) и, если параметр
+    ordering не передан, упорядочиваются по его ключу (TAG_ORDERING).
+    """
+    tag_param = 'tag'
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.tag_param)
+        if not name:
+            return queryset
+        queryset = queryset.filter(tagpost__tag__name=name).annotate(
+            tag_post=F('tagpost__post')
+        )
+        if filters.OrderingFilter.ordering_param not in request.query_params:
+            queryset = queryset.order_by(*TAG_ORDERING)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.tag_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Название тега',
+            'schema': {
+                'type': 'string',
+            },
+        }]
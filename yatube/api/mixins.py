@@ -0,0 +1,194 @@
+from django.conf import settings
+from django.db import transaction
+from rest_framework import exceptions, status
+from rest_framework.decorators import action
+from rest_framework.relations import RelatedField
+from rest_framework.response import Response
+
+
+class BatchModelMixin:
+    """
+    Примесь для пакетного создания, изменения и удаления объектов.
+
+    Действие batch принимает список: POST - данные новых объектов,
+    PATCH - изменения объектов с полем id, DELETE - id объектов. Все
+    объекты проверяются за один проход, а корректные сохраняются пакетными
+    запросами в одной транзакции (perform_batch_create и
+    perform_batch_update). Ответ содержит результат по каждому элементу
+    в порядке запроса: код status и данные объекта (data) или ошибки
+    (errors). Размер пакета ограничен настройкой API_BATCH_MAX_SIZE.
+    Объекты связанных полей загружаются для всего пакета заранее
+    (get_batch_context).
+    """
+
+    @action(detail=False, methods=('post', 'patch', 'delete'))
+    def batch(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise exceptions.ValidationError('Ожидается список объектов')
+        if len(items) > settings.API_BATCH_MAX_SIZE:
+            raise exceptions.ValidationError(
+                f'В пакете больше {settings.API_BATCH_MAX_SIZE} объектов'
+            )
+        handler = {
+            'POST': self.batch_create,
+            'PATCH': self.batch_update,
+            'DELETE': self.batch_destroy,
+        }[request.method]
+        return Response({'results': handler(items)})
+
+    def batch_create(self, items):
+        results = [None] * len(items)
+        context = self.get_batch_context(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer))
+            else:
+                results[index] = self.batch_error(serializer.errors)
+        if valid:
+            with transaction.atomic():
+                instances = self.perform_batch_create(
+                    [serializer for _, serializer in valid]
+                )
+            self.batch_data(valid, instances, status.HTTP_201_CREATED, results)
+        return results
+
+    def batch_update(self, items):
+        results = [None] * len(items)
+        instances = self.get_batch_instances(items, results)
+        context = self.get_batch_context(
+            [items[index] for index in instances]
+        )
+        valid = []
+        for index, instance in instances.items():
+            serializer = self.get_serializer(
+                instance, data=items[index], partial=True, context=context
+            )
+            if serializer.is_valid():
+                valid.append((index, serializer))
+            else:
+                results[index] = self.batch_error(serializer.errors)
+        if valid:
+            with transaction.atomic():
+                updated = self.perform_batch_update(
+                    [serializer for _, serializer in valid]
+                )
+            self.batch_data(valid, updated, status.HTTP_200_OK, results)
+        return results
+
+    def batch_destroy(self, items):
+        results = [None] * len(items)
+        items = [item if isinstance(item, dict) else {'id': item}
+                 for item in items]
+        instances = self.get_batch_instances(items, results)
+        if instances:
+            with transaction.atomic():
+                self.perform_batch_destroy(list(instances.values()))
+            for index in instances:
+                results[index] = {'status': status.HTTP_204_NO_CONTENT}
+        return results
+
+    def get_batch_context(self, items):
+        """
+        Возвращает контекст сериализаторов пакета, в котором related -
+        {имя поля: {значение строкой: объект}} для изменяемых связанных
+        полей. Объекты каждого поля читаются одним in_bulk по значениям
+        всех элементов, а не отдельным запросом на элемент.
+        """
+        context = self.get_serializer_context()
+        related = {}
+        for name, field in self.get_serializer().fields.items():
+            if field.read_only or not isinstance(field, RelatedField):
+                continue
+            lookup = getattr(field, 'slug_field', 'pk')
+            values = {
+                str(item[name]) for item in items
+                if isinstance(item, dict)
+                and isinstance(item.get(name), (int, str))
+                and not isinstance(item[name], bool)
+            }
+            if lookup == 'pk':
+                values = {value for value in values if value.isdigit()}
+            if values:
+                objects = field.get_queryset().in_bulk(
+                    values, field_name=lookup
+                )
+                related[name] = {
+                    str(key): obj for key, obj in objects.items()
+                }
+        context['related'] = related
+        return context
+
+    def get_batch_instances(self, items, results):
+        """
+        Возвращает {индекс элемента: объект} для элементов, объекты
+        которых найдены и доступны пользователю. Остальным элементам
+        записывает ошибку в results.
+        """
+        ids = {}
+        for index, item in enumerate(items):
+            pk = item.get('id') if isinstance(item, dict) else None
+            if isinstance(pk, int) and not isinstance(pk, bool):
+                ids[index] = pk
+            else:
+                results[index] = self.batch_error(
+                    {'id': ['Обязательное поле.']}
+                )
+        objects = self.get_queryset().in_bulk(set(ids.values()))
+        instances = {}
+        for index, pk in ids.items():
+            instance = objects.get(pk)
+            if instance is None:
+                results[index] = self.batch_error(
+                    {'detail': 'Страница не найдена.'},
+                    status.HTTP_404_NOT_FOUND
+                )
+                continue
+            try:
+                self.check_object_permissions(self.request, instance)
+            except exceptions.APIException as error:
+                results[index] = self.batch_error(
+                    {'detail': error.detail}, error.status_code
+                )
+                continue
+            instances[index] = instance
+        return instances
+
+    def batch_data(self, valid, instances, code, results):
+        """
+        Записывает в results данные сохраненных объектов.
+
+        Объекты перечитываются одним запросом get_queryset, чтобы связанные
+        объекты были загружены пакетно.
+        """
+        objects = self.get_queryset().in_bulk(
+            [instance.pk for instance in instances]
+        )
+        for (index, _), instance in zip(valid, instances):
+            serializer = self.get_serializer(objects[instance.pk])
+            results[index] = {'status': code, 'data': serializer.data}
+
+    def batch_error(self, errors, code=status.HTTP_400_BAD_REQUEST):
+        return {'status': code, 'errors': errors}
+
+    def perform_batch_create(self, serializers):
+        """
+        Сохраняет новые объекты и возвращает их в порядке serializers.
+        """
+        return [serializer.save() for serializer in serializers]
+
+    def perform_batch_update(self, serializers):
+        """
+        Сохраняет изменения объектов и возвращает их в порядке serializers.
+        """
+        return [serializer.save() for serializer in serializers]
+
+    def perform_batch_destroy(self, instances):
+        """
+        Удаляет объекты одним запросом (с сигналами удаления).
+        """
+        self.get_queryset().model.objects.filter(
+            pk__in=[instance.pk for instance in instances]
+        ).delete()
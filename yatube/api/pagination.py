@@ -1,6 +1,12 @@
-from rest_framework.pagination import LimitOffsetPagination
+from collections import OrderedDict
+
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.response import Response
 
+from posts.comments import THREAD_ORDERING
+from posts.tags import TAG_ORDERING
+
 
 class CustomPagination(LimitOffsetPagination):
     """
@@ -15,3 +21,92 @@ class CustomPagination(LimitOffsetPagination):
             'count': self.count,
             'response': data
         })
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Класс для курсорной пагинации.
+
+    Включается параметром 'cursor' или 'page_size', стоимость страницы не
+    зависит от ее глубины. Запросы с 'limit'/'offset' обрабатываются
+    LimitOffsetPagination, а запросы без параметров возвращают список
+    без пагинации. Ответ содержит поле 'count', от подсчета которого можно
+    отказаться параметром count=false.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        self.fallback = None
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            self.fallback = LimitOffsetPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+        self.count = None
+        if params.get(self.count_query_param, '').lower() not in (
+            'false', '0', 'no'
+        ):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        response = OrderedDict((
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ))
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {
+            'type': 'integer',
+            'example': 123,
+        }
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': self.count_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Вернуть общее количество объектов',
+            'schema': {
+                'type': 'boolean',
+            },
+        })
+        return parameters
+
+
+class PostPagination(KeysetPagination):
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Посты тега (TagFilter) без параметра ordering листаются по ключу
+        индекса связей (TAG_ORDERING).
+        """
+        if ('tag_post' in queryset.query.annotations
+                and OrderingFilter.ordering_param not in request.query_params):
+            return TAG_ORDERING
+        return super().get_ordering(request, queryset, view)
+
+
+class CommentPagination(KeysetPagination):
+    ordering = ('-created', '-id')
+
+
+class ThreadPagination(KeysetPagination):
+    ordering = THREAD_ORDERING
+
+
+class FollowPagination(KeysetPagination):
+    ordering = ('-id',)
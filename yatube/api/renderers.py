@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Рендерер NDJSON: один объект JSON на строку.
+
+    Выгрузки передаются потоком в обход рендерера, он используется только
+    для ответов с ошибками.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Рендерер CSV.
+
+    Выгрузки передаются потоком в обход рендерера, он используется только
+    для ответов с ошибками: пары ключ-значение выводятся строками.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+        for key, value in items:
+            writer.writerow((key, value))
+        return buffer.getvalue().encode()
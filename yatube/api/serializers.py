@@ -1,7 +1,48 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from posts.models import Post, Group, User, Comment, Tag, TagPost, Follow
+from core.uploadhandler import check_upload
+from posts.comments import validate_parent
+from posts.models import Post, Group, User, Comment, Tag, Follow
+from posts.tags import set_post_tags
+
+
+class UploadImageField(serializers.ImageField):
+    """
+    Поле картинки, выводящее причину отказа потокового обработчика загрузки.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            check_upload(data)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.messages)
+        return super().to_internal_value(data)
+
+
+class BatchRelatedMixin:
+    """
+    Примесь связанного поля, которое ищет объект сначала в словаре
+    context['related'][имя поля] ({значение строкой: объект}), загруженном
+    для всего пакета (BatchModelMixin), и только затем запросом.
+    """
+
+    def to_internal_value(self, data):
+        found = self.context.get('related', {}).get(self.field_name, {})
+        if str(data) in found:
+            return found[str(data)]
+        return super().to_internal_value(data)
+
+
+class BatchPrimaryKeyRelatedField(BatchRelatedMixin,
+                                  serializers.PrimaryKeyRelatedField):
+    pass
+
+
+class BatchSlugRelatedField(BatchRelatedMixin, serializers.SlugRelatedField):
+    pass
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -22,51 +63,50 @@ class PostSerializer(serializers.ModelSerializer):
     Сериализатор для модели Post.
 
     Включает дополнительные поля для автора, группы, комментариев и тегов.
+    Поле 'image_variants' содержит варианты картинки для srcset.
     """
     author = serializers.SerializerMethodField()
-    group = serializers.SlugRelatedField(slug_field='slug',
-                                         queryset=Group.objects.all(),
-                                         required=False)
-    comments = serializers.SerializerMethodField()
+    group = BatchSlugRelatedField(slug_field='slug',
+                                  queryset=Group.objects.all(),
+                                  required=False)
+    comments = serializers.IntegerField(source='comments_count',
+                                        read_only=True)
     tags = TagSerializer(many=True, required=False)
     publication_date = serializers.DateTimeField(source='pub_date',
                                                  read_only=True)
+    image_variants = serializers.SerializerMethodField()
+
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: UploadImageField,
+    }
 
     class Meta:
         model = Post
-        fields = ('id', 'text', 'author', 'image', 'group', 'tags',
-                  'comments', 'publication_date')
+        fields = ('id', 'text', 'author', 'image', 'image_variants', 'group',
+                  'tags', 'comments', 'publication_date')
 
     def create(self, validated_data):
         """
         Создает новый объект Post, учитывая теги, если они есть.
         """
-        if 'tags' not in self.initial_data:
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
             post = Post.objects.create(**validated_data)
-            return post
-        tags = validated_data.pop('tags')
-        post = Post.objects.create(**validated_data)
-        for tag in tags:
-            current_tag, _ = Tag.objects.get_or_create(**tag)
-            TagPost.objects.create(tag=current_tag, post=post)
-            return post
+            if tags:
+                set_post_tags(post, (tag['name'] for tag in tags),
+                              created=True)
+        return post
 
     def update(self, instance, validated_data):
         """
         Обновляет существующий объект Post, включая обновление тегов.
         """
-        if 'tags' not in self.initial_data:
-            return super().update(instance, validated_data)
-        tags = validated_data.pop('tags')
-        instance_tags = TagPost.objects.filter(post=instance)
-        for tag in tags:
-            current_tag, _ = Tag.objects.get_or_create(**tag)
-            if current_tag not in instance_tags:
-                TagPost.objects.create(tag=current_tag, post=instance)
-        for tag in instance_tags:
-            if tag not in tags:
-                tag.delete()
-        super().update(instance, validated_data)
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if tags is not None:
+                set_post_tags(instance, (tag['name'] for tag in tags))
         return instance
 
     def get_author(self, obj):
@@ -75,19 +115,37 @@ class PostSerializer(serializers.ModelSerializer):
         """
         return obj.author.username
 
-    def get_comments(self, obj):
+    def get_image_variants(self, obj):
         """
-        Получает количество комментариев к посту.
+        Получает варианты картинки поста по размерам и форматам: ширину
+        и адрес.
         """
-        return obj.comments.count()
+        request = self.context.get('request')
+        return {
+            size: {
+                format_name: [
+                    {
+                        'width': width,
+                        'url': (request.build_absolute_uri(url)
+                                if request is not None else url),
+                    }
+                    for width, url in variants
+                ]
+                for format_name, variants in formats.items()
+            }
+            for size, formats in obj.image_variants.items()
+        }
 
 
 class PostListSerializer(PostSerializer):
     """
     Сериализатор для списка постов.
 
-    Включает основные поля поста.
+    Включает основные поля поста. Поле 'text' содержит отрывок текста
+    (excerpt) длиной до Post.EXCERPT_LENGTH символов, полный текст
+    возвращается при запросе поста.
     """
+    text = serializers.CharField(source='excerpt', read_only=True)
 
     class Meta:
         model = Post
@@ -110,16 +168,36 @@ class CommentSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Comment.
 
-    Включает поля для поста, автора, текста и даты создания комментария.
+    Включает поля для поста, автора, текста и даты создания комментария,
+    а также parent (ответ на комментарий того же поста) и depth (глубина
+    в ветке). Родителя можно задать только при создании.
     """
     author = serializers.PrimaryKeyRelatedField(
         source='author.username', read_only=True
     )
+    serializer_related_field = BatchPrimaryKeyRelatedField
 
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'author', 'text', 'created')
-        read_only_fields = ('post', 'created')
+        fields = ('id', 'post', 'author', 'text', 'created', 'parent',
+                  'depth')
+        read_only_fields = ('post', 'created', 'depth')
+
+    def validate_parent(self, parent):
+        """
+        Проверяет, что родитель относится к тому же посту и не меняется.
+        """
+        if self.instance is not None:
+            if getattr(parent, 'pk', None) != self.instance.parent_id:
+                raise serializers.ValidationError(
+                    'Нельзя перенести комментарий в другую ветку'
+                )
+            return parent
+        try:
+            validate_parent(parent, self.context['view'].kwargs['post_id'])
+        except DjangoValidationError as error:
+            raise serializers.ValidationError(error.messages)
+        return parent
 
 
 class FollowSerializer(serializers.ModelSerializer):
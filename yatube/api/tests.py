@@ -1,3 +1,528 @@
-from django.test import TestCase
+import csv
+import io
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+
+from posts.models import Comment, Follow, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class PostPaginationTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        for i in range(15):
+            Post.objects.create(text=f'Текст_{i}', author=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_pages(self):
+        """Курсорная пагинация проходит все посты без повторов."""
+        response = self.client.get('/api/v1/posts/', {'page_size': 10})
+        data = response.json()
+        self.assertEqual(data['count'], 15)
+        self.assertEqual(len(data['results']), 10)
+        self.assertIsNone(data['previous'])
+        next_page = self.client.get(data['next']).json()
+        self.assertEqual(len(next_page['results']), 5)
+        self.assertIsNone(next_page['next'])
+        ids = [post['id'] for post in data['results'] + next_page['results']]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-id')
+                      .values_list('id', flat=True))
+        )
+
+    def test_count_opt_out(self):
+        """Параметр count=false отключает подсчет количества."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/v1/posts/', {'page_size': 5, 'count': 'false'}
+            )
+        self.assertNotIn('count', response.json())
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT COUNT(*)')
+            for query in queries
+        ))
+
+    def test_limit_offset_is_kept(self):
+        """Пагинация limit/offset и ответ без пагинации сохраняются."""
+        response = self.client.get('/api/v1/posts/', {'limit': 2})
+        self.assertEqual(response.json()['count'], 15)
+        response = self.client.get('/api/v1/posts/')
+        self.assertEqual(len(response.json()), 15)
+
+
+class QueryCountTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        group = Group.objects.create(title='Группа', slug='group')
+        tag = Tag.objects.create(name='тег')
+        for i in range(10):
+            author = User.objects.create(username=f'author_{i}')
+            Follow.objects.create(user=cls.user, following=author)
+            post = Post.objects.create(
+                text=f'Текст_{i}', author=author, group=group
+            )
+            TagPost.objects.create(tag=tag, post=post)
+            Comment.objects.create(post=post, author=author, text='Текст')
+        cls.post = post
+        for i in range(10):
+            Comment.objects.create(post=post, author=cls.user, text='Текст')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_query_count(self):
+        """Число запросов к API не зависит от числа объектов."""
+        urls = {
+            '/api/v1/posts/': 1,
+            '/api/v1/posts/?limit=5': 2,
+            '/api/v1/posts/?page_size=5': 2,
+            f'/api/v1/posts/{self.post.id}/': 2,
+            f'/api/v1/posts/{self.post.id}/comments/': 2,
+            '/api/v1/follow/': 1,
+            '/api/v1/groups/': 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
+
+    def test_comments_count(self):
+        """Поле comments содержит число комментариев к посту."""
+        response = self.client.get(f'/api/v1/posts/{self.post.id}/')
+        self.assertEqual(response.json()['comments'], 11)
+
+
+class ExportTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Текст, с "кавычками"', author=cls.user, group=cls.group
+        )
+        Post.objects.create(text='Второй', author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.staff, text='Ком')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        """Посты выгружаются потоком в NDJSON."""
+        response = self.client.get('/api/v1/export/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/x-ndjson'
+        ))
+        records = [json.loads(line)
+                   for line in self.read(response).splitlines()]
+        self.assertEqual([record['id'] for record in records],
+                         sorted(Post.objects.values_list('pk', flat=True)))
+        self.assertEqual(records[0]['author'], 'testuser')
+        self.assertEqual(records[0]['group'], 'group')
+        self.assertIsNone(records[1]['group'])
+
+    def test_csv_export(self):
+        """Комментарии выгружаются потоком в CSV."""
+        response = self.client.get(
+            '/api/v1/export/comments/', {'format': 'csv'}
+        )
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(self.read(response))))
+        self.assertEqual(
+            rows[0], ['id', 'post', 'parent', 'author', 'text', 'created']
+        )
+        self.assertEqual(rows[1][1:5], [str(self.post.pk), '', 'staff', 'Ком'])
+
+    def test_export_permissions(self):
+        """Выгрузка доступна только персоналу."""
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/v1/export/posts/')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/v1/export/posts/', {'format': 'csv'})
+        self.assertEqual(response.status_code, 401)
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/v1/export/users/')
+        self.assertEqual(response.status_code, 404)
+
+
+class PostTagsTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        Tag.objects.create(name='кот')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_tags(self, post_id):
+        return sorted(Post.objects.get(pk=post_id).tags
+                      .values_list('name', flat=True))
+
+    def test_create_with_tags(self):
+        """Пост создается со всеми тегами, существующие теги не дублируются."""
+        tags = [{'tag_name': name} for name in ('кот', 'пес', 'пес', 'еж')]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/v1/posts/', {'text': 'Текст', 'tags': tags},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.get_tags(response.json()['id']), ['еж', 'кот', 'пес']
+        )
+        self.assertEqual(Tag.objects.count(), 3)
+        tag_queries = [query['sql'] for query in context.captured_queries
+                       if 'posts_tag' in query['sql']]
+        self.assertLessEqual(len(tag_queries), 6)
+
+    def test_create_without_tags(self):
+        """Пост без тегов создается как раньше."""
+        response = self.client.post(
+            '/api/v1/posts/', {'text': 'Текст', 'tags': []}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_tags(response.json()['id']), [])
+
+    def test_update_tags(self):
+        """Изменение тегов добавляет новые связи и удаляет лишние."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        url = f'/api/v1/posts/{post.pk}/'
+        self.client.patch(url, {'tags': [
+            {'tag_name': 'кот'}, {'tag_name': 'пес'}
+        ]}, format='json')
+        self.assertEqual(self.get_tags(post.pk), ['кот', 'пес'])
+        response = self.client.patch(url, {'tags': [
+            {'tag_name': 'пес'}, {'tag_name': 'еж'}
+        ]}, format='json')
+        self.assertEqual(
+            sorted(tag['tag_name'] for tag in response.json()['tags']),
+            ['еж', 'пес']
+        )
+        self.assertEqual(self.get_tags(post.pk), ['еж', 'пес'])
+        self.client.patch(url, {'text': 'Новый текст'}, format='json')
+        self.assertEqual(self.get_tags(post.pk), ['еж', 'пес'])
+        self.client.patch(url, {'tags': []}, format='json')
+        self.assertEqual(self.get_tags(post.pk), [])
+
+
+class BatchTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.other = User.objects.create(username='other')
+        cls.reader = User.objects.create(username='reader')
+        Follow.objects.create(user=cls.reader, following=cls.user)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, method, items, url='/api/v1/posts/batch/'):
+        response = getattr(self.client, method)(url, items, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def create_posts(self, count):
+        return self.batch('post', [
+            {'text': f'Текст {i}', 'group': 'group',
+             'tags': [{'tag_name': 'кот'}]}
+            for i in range(count)
+        ])
+
+    def test_create(self):
+        """Пакетное создание сохраняет корректные посты и их теги."""
+        results = self.batch('post', [
+            {'text': 'Первый пост', 'group': 'group',
+             'tags': [{'tag_name': 'кот'}, {'tag_name': 'пес'}]},
+            {'group': 'group'},
+            {'text': 'Второй пост'},
+        ])
+        self.assertEqual([result['status'] for result in results],
+                         [201, 400, 201])
+        self.assertIn('text', results[1]['errors'])
+        first, second = results[0]['data'], results[2]['data']
+        self.assertEqual(first['author'], 'testuser')
+        self.assertEqual(first['group'], 'group')
+        self.assertEqual(
+            sorted(tag['tag_name'] for tag in first['tags']), ['кот', 'пес']
+        )
+        self.assertEqual(
+            Post.objects.get(pk=second['id']).text, 'Второй пост'
+        )
+        self.assertEqual(self.user.stats.posts_count, 2)
+        self.assertEqual(Tag.objects.get(name='кот').posts_count, 1)
+        self.assertEqual(
+            set(self.reader.feed.values_list('post', flat=True)),
+            {first['id'], second['id']}
+        )
+        response = self.client.get('/api/v1/posts/', {'search': 'первый'})
+        self.assertEqual(
+            [post['id'] for post in response.json()],
+            [first['id']]
+        )
+
+    def test_create_query_count(self):
+        """Число запросов пакетного создания не растет с размером пакета."""
+        self.create_posts(1)
+        with CaptureQueriesContext(connection) as small:
+            self.create_posts(2)
+        with CaptureQueriesContext(connection) as large:
+            self.create_posts(20)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Tag.objects.get(name='кот').posts_count, 23)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 23)
+
+    def test_comments_query_count(self):
+        """Число запросов пакета ответов не растет с размером пакета."""
+        post = Post.objects.create(text='Текст', author=self.other)
+        parent = Comment.objects.create(
+            post=post, author=self.other, text='Корень'
+        )
+        url = f'/api/v1/posts/{post.pk}/comments/batch/'
+
+        def reply(count):
+            return self.batch('post', [
+                {'text': f'Ответ {i}', 'parent': parent.pk}
+                for i in range(count)
+            ], url=url)
+
+        reply(1)
+        with CaptureQueriesContext(connection) as small:
+            reply(2)
+        with CaptureQueriesContext(connection) as large:
+            ids = [result['data']['id'] for result in reply(20)]
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(
+            Comment.objects.filter(parent=parent, depth=1).count(), 23
+        )
+        with CaptureQueriesContext(connection) as small:
+            self.batch('patch', [
+                {'id': pk, 'text': 'Исправлен', 'parent': parent.pk}
+                for pk in ids[:2]
+            ], url=url)
+        with CaptureQueriesContext(connection) as large:
+            results = self.batch('patch', [
+                {'id': pk, 'text': 'Исправлен', 'parent': parent.pk}
+                for pk in ids
+            ], url=url)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual({result['status'] for result in results}, {200})
+
+    def test_update(self):
+        """Пакетное изменение проверяет доступ к каждому посту."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        alien = Post.objects.create(text='Чужой', author=self.other)
+        results = self.batch('patch', [
+            {'id': post.pk, 'text': 'Новый текст',
+             'tags': [{'tag_name': 'еж'}]},
+            {'id': alien.pk, 'text': 'Взлом'},
+            {'id': 0, 'text': 'Нет поста'},
+            {'text': 'Без id'},
+        ])
+        self.assertEqual([result['status'] for result in results],
+                         [200, 403, 404, 400])
+        self.assertEqual(results[0]['data']['text'], 'Новый текст')
+        post.refresh_from_db()
+        alien.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(alien.text, 'Чужой')
+        self.assertEqual(list(post.tags.values_list('name', flat=True)),
+                         ['еж'])
+        self.assertEqual(Tag.objects.get(name='еж').posts_count, 1)
+
+    def test_destroy(self):
+        """Пакетное удаление удаляет только посты пользователя."""
+        ids = [result['data']['id'] for result in self.create_posts(3)]
+        alien = Post.objects.create(text='Чужой', author=self.other)
+        results = self.batch(
+            'delete', ids[:2] + [alien.pk], url='/api/v1/posts/batch/'
+        )
+        self.assertEqual([result['status'] for result in results],
+                         [204, 204, 403])
+        self.assertEqual(
+            list(Post.objects.filter(author=self.user)
+                 .values_list('id', flat=True)),
+            ids[2:]
+        )
+        self.assertEqual(Tag.objects.get(name='кот').posts_count, 1)
+        self.assertEqual(User.objects.get(pk=self.user.pk)
+                         .stats.posts_count, 1)
+
+    def test_max_size(self):
+        """Пакет больше API_BATCH_MAX_SIZE и не список отклоняются."""
+        with self.settings(API_BATCH_MAX_SIZE=2):
+            response = self.client.post(
+                '/api/v1/posts/batch/', [{'text': 'Текст'}] * 3,
+                format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/v1/posts/batch/', {'text': 'Текст'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
+    def test_comments(self):
+        """Пакетное создание комментариев обновляет их счетчик."""
+        post = Post.objects.create(text='Текст', author=self.other)
+        url = f'/api/v1/posts/{post.pk}/comments/batch/'
+        results = self.batch('post', [
+            {'text': 'Первый'}, {'text': ''}, {'text': 'Второй'}
+        ], url=url)
+        self.assertEqual([result['status'] for result in results],
+                         [201, 400, 201])
+        self.assertEqual(results[0]['data']['author'], 'testuser')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        ids = [results[0]['data']['id'], results[2]['data']['id']]
+        results = self.batch('patch', [
+            {'id': ids[0], 'text': 'Исправлен'}
+        ], url=url)
+        self.assertEqual(results[0]['data']['text'], 'Исправлен')
+        self.assertEqual(
+            self.batch('delete', ids, url=url),
+            [{'status': 204}, {'status': 204}]
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+
+class CommentThreadTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        cls.url = f'/api/v1/posts/{cls.post.pk}/comments/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def comment(self, text, parent=None):
+        response = self.client.post(
+            self.url, {'text': text, 'parent': parent}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_tree_and_thread(self):
+        """Ветки читаются в порядке ответов с ограничением глубины."""
+        first = self.comment('1')
+        first_1 = self.comment('1.1', first)
+        self.comment('1.1.1', first_1)
+        second = self.comment('2')
+        self.comment('1.2', first)
+        self.comment('2.1', second)
+        response = self.client.get(f'{self.url}tree/')
+        self.assertEqual(
+            [(item['text'], item['depth']) for item in response.json()],
+            [('1', 0), ('1.1', 1), ('1.1.1', 2), ('1.2', 1), ('2', 0),
+             ('2.1', 1)]
+        )
+        response = self.client.get(f'{self.url}tree/', {'depth': 0})
+        self.assertEqual([item['text'] for item in response.json()],
+                         ['1', '2'])
+        response = self.client.get(f'{self.url}{first}/thread/',
+                                   {'depth': 1})
+        self.assertEqual([item['text'] for item in response.json()],
+                         ['1', '1.1', '1.2'])
+        response = self.client.get(f'{self.url}{first}/thread/',
+                                   {'page_size': 2})
+        data = response.json()
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['1', '1.1'])
+        next_page = self.client.get(data['next']).json()
+        self.assertEqual([item['text'] for item in next_page['results']],
+                         ['1.1.1', '1.2'])
+        response = self.client.get(f'{self.url}tree/', {'depth': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_parent_validation(self):
+        """Родитель должен относиться к посту и не меняется при изменении."""
+        other = Post.objects.create(text='Текст', author=self.user)
+        alien = Comment.objects.create(post=other, author=self.user,
+                                       text='Чужой')
+        response = self.client.post(
+            self.url, {'text': 'Ответ', 'parent': alien.pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        root = self.comment('Корень')
+        reply = self.comment('Ответ', root)
+        response = self.client.patch(
+            f'{self.url}{reply}/', {'parent': None}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(
+            f'{self.url}{reply}/', {'text': 'Исправлен'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_replies(self):
+        """Пакетно созданные ответы получают пути веток."""
+        root = self.comment('Корень')
+        response = self.client.post(f'{self.url}batch/', [
+            {'text': 'Ответ 1', 'parent': root}, {'text': 'Корень 2'},
+        ], format='json')
+        results = response.json()['results']
+        self.assertEqual([result['data']['depth'] for result in results],
+                         [1, 0])
+        response = self.client.get(f'{self.url}{root}/thread/')
+        self.assertEqual([item['text'] for item in response.json()],
+                         ['Корень', 'Ответ 1'])
+        created = Comment.objects.get(pk=results[1]['data']['id'])
+        self.assertEqual(
+            created.path, str(created.pk).zfill(Comment.PATH_WIDTH)
+        )
+
+
+class PostExcerptTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.post = Post.objects.create(text='слово ' * 100, author=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_excerpt(self):
+        """Список постов содержит отрывок, пост - полный текст."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/v1/posts/')
+        self.assertEqual(response.json()[0]['text'], self.post.excerpt)
+        self.assertNotIn(
+            '"posts_post"."text"', context.captured_queries[0]['sql']
+        )
+        response = self.client.get(f'/api/v1/posts/{self.post.pk}/')
+        self.assertEqual(response.json()['text'], self.post.text)
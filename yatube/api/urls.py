@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import (SpectacularAPIView, SpectacularSwaggerView,
                                    SpectacularRedocView)
 
-from .views import PostViewSet, GroupViewSet, CommentViewSet, FollowViewSet
+from .views import (PostViewSet, GroupViewSet, CommentViewSet, FollowViewSet,
+                    ExportView)
 
 app_name = 'api'
 
@@ -16,6 +17,7 @@ router.register('follow', FollowViewSet, basename='follow')
 
 urlpatterns = [
     path('v1/', include(router.urls)),
+    path('v1/export/<str:kind>/', ExportView.as_view(), name='export'),
     path('v1/', include('djoser.urls')),
     path('v1/', include('djoser.urls.jwt')),
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
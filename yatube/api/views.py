@@ -1,30 +1,54 @@
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets
 from rest_framework import filters
 from rest_framework import mixins
 from rest_framework import permissions
 from rest_framework import exceptions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from posts.bulk import (bulk_insert, posts_created, posts_updated,
+                        comments_created, comments_updated)
+from posts.comments import THREAD_ORDERING, set_paths, subtree
+from posts.export import EXPORTS, export_lines
 from posts.models import Post, Group, Comment, Follow
+from posts.tags import set_posts_tags
 from .serializers import (PostSerializer, PostListSerializer, GroupSerializer,
                           CommentSerializer, FollowSerializer,)
 from .permissions import IsAuthorOrReadOnly
+from .filters import FullTextSearchFilter, TagFilter
+from .mixins import BatchModelMixin
+from .pagination import (PostPagination, CommentPagination, FollowPagination,
+                         ThreadPagination)
+from .renderers import CSVRenderer, NDJSONRenderer
 # from .throttling import LunchBreakThrottle
-# from .pagination import CustomPagination
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(BatchModelMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с постами.
 
-    Поддерживает все CRUD операции и включает фильтрацию по тексту и сортировку по дате публикации.
+    Поддерживает все CRUD операции и включает полнотекстовый поиск, фильтр по тегу и сортировку по дате публикации.
+    Посты можно создавать, изменять и удалять пакетно (batch/).
     """
     queryset = Post.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     # throttle_classes = (LunchBreakThrottle,)
-    # pagination_class = CustomPagination
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
-    search_fields = ('$text',)
+    pagination_class = PostPagination
+    filter_backends = (filters.OrderingFilter, FullTextSearchFilter,
+                       TagFilter)
     ordering_fields = ('pub_date',)
+    ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        """
+        Возвращает посты с автором и группой, а кроме списка - и с тегами
+        (в списке они не выводятся).
+        """
+        if self.action == 'list':
+            return Post.objects.for_cards()
+        return Post.objects.with_tags()
 
     def get_serializer_class(self):
         """
@@ -40,6 +64,46 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         serializer.save(author=self.request.user)
 
+    def perform_batch_create(self, serializers):
+        """
+        Создает посты одним запросом, затем пакетно задает теги и
+        обновляет счетчики, поисковый индекс и ленты.
+        """
+        posts, names = [], []
+        for serializer in serializers:
+            data = dict(serializer.validated_data)
+            names.append([tag['name'] for tag in data.pop('tags', ())])
+            posts.append(Post(author=self.request.user, **data))
+        bulk_insert(Post, posts)
+        set_posts_tags(
+            {post: tags for post, tags in zip(posts, names) if tags},
+            created=True
+        )
+        posts_created(posts)
+        return posts
+
+    def perform_batch_update(self, serializers):
+        """
+        Сохраняет изменения постов одним bulk_update, затем пакетно
+        заменяет теги и обновляет поисковый индекс.
+        """
+        posts, fields, tags = [], set(), {}
+        for serializer in serializers:
+            post = serializer.instance
+            data = dict(serializer.validated_data)
+            if 'tags' in data:
+                tags[post] = [tag['name'] for tag in data.pop('tags')]
+            for attr, value in data.items():
+                setattr(post, attr, value)
+            fields.update(data)
+            posts.append(post)
+        if fields:
+            Post.objects.bulk_update(posts, fields)
+        if tags:
+            set_posts_tags(tags)
+        posts_updated(posts)
+        return posts
+
 
 class GroupViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -52,14 +116,18 @@ class GroupViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAuthorOrReadOnly,)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(BatchModelMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с комментариями.
 
-    Поддерживает все CRUD операции.
+    Поддерживает все CRUD операции, в том числе пакетные (batch/), и
+    чтение веток в порядке ответов: всех веток поста (tree/) и ветки
+    комментария (<id>/thread/). Параметр depth ограничивает глубину
+    ответов, ветка читается одним запросом по пути комментариев.
     """
     serializer_class = CommentSerializer
     permission_classes = (IsAuthorOrReadOnly,)
+    pagination_class = CommentPagination
 
     def get_queryset(self):
         """
@@ -70,7 +138,7 @@ class CommentViewSet(viewsets.ModelViewSet):
             post = Post.objects.get(pk=post_id)
         except Post.DoesNotExist:
             raise exceptions.NotFound
-        queryset = Comment.objects.filter(post=post)
+        queryset = Comment.objects.filter(post=post).select_related('author')
         return queryset
 
     def perform_create(self, serializer):
@@ -84,6 +152,86 @@ class CommentViewSet(viewsets.ModelViewSet):
             raise exceptions.NotFound
         serializer.save(post=post, author=self.request.user)
 
+    def perform_batch_create(self, serializers):
+        """
+        Создает комментарии к посту одним запросом и обновляет счетчик
+        комментариев поста.
+        """
+        post_id = self.kwargs.get('post_id')
+        try:
+            post = Post.objects.get(pk=post_id)
+        except Post.DoesNotExist:
+            raise exceptions.NotFound
+        comments = [
+            Comment(post=post, author=self.request.user,
+                    **serializer.validated_data)
+            for serializer in serializers
+        ]
+        for comment in comments:
+            comment.depth = comment.get_depth()
+        bulk_insert(Comment, comments)
+        set_paths(comments)
+        comments_created(comments)
+        return comments
+
+    def perform_batch_update(self, serializers):
+        """
+        Сохраняет изменения комментариев одним bulk_update.
+        """
+        comments = []
+        for serializer in serializers:
+            comment = serializer.instance
+            for attr, value in serializer.validated_data.items():
+                setattr(comment, attr, value)
+            comments.append(comment)
+        Comment.objects.bulk_update(comments, ('text',))
+        comments_updated(comments)
+        return comments
+
+    @action(detail=False, pagination_class=ThreadPagination)
+    def tree(self, request, *args, **kwargs):
+        """
+        Возвращает все ветки комментариев поста в порядке ответов.
+        """
+        queryset = self.get_queryset()
+        depth = self.get_depth()
+        if depth is not None:
+            queryset = queryset.filter(depth__lte=depth)
+        return self.thread_response(queryset)
+
+    @action(detail=True, pagination_class=ThreadPagination)
+    def thread(self, request, *args, **kwargs):
+        """
+        Возвращает комментарий и ответы на него в порядке ответов.
+        """
+        comment = self.get_object()
+        queryset = self.get_queryset().filter(
+            subtree(comment, self.get_depth(), include_self=True)
+        )
+        return self.thread_response(queryset)
+
+    def get_depth(self):
+        """
+        Возвращает ограничение глубины ответов из параметра depth.
+        """
+        depth = self.request.query_params.get('depth')
+        if depth is None:
+            return None
+        if not depth.isdigit():
+            raise exceptions.ValidationError(
+                {'depth': 'Ожидается неотрицательное целое число'}
+            )
+        return int(depth)
+
+    def thread_response(self, queryset):
+        queryset = queryset.order_by(*THREAD_ORDERING)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 
 class FollowViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
                     mixins.DestroyModelMixin, viewsets.GenericViewSet):
@@ -94,6 +242,7 @@ class FollowViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
     """
     serializer_class = FollowSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = FollowPagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ('following__username',)
 
@@ -101,7 +250,7 @@ class FollowViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
         """
         Возвращает список подписок текущего пользователя.
         """
-        queryset = Follow.objects.all()
+        queryset = Follow.objects.select_related('user', 'following')
         user = self.request.user
         queryset = queryset.filter(user=user)
         return queryset
@@ -111,3 +260,29 @@ class FollowViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
         Устанавливает текущего пользователя как подписчика.
         """
         serializer.save(user=self.request.user)
+
+
+class ExportView(APIView):
+    """
+    Потоковая выгрузка постов, комментариев, подписок или тегов.
+
+    Доступна только персоналу. Формат (ndjson или csv) выбирается
+    параметром format или заголовком Accept. Ответ передается потоком,
+    строки читаются из базы пачками, поэтому выгрузка любого объема
+    не расходует память и начинается сразу.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (NDJSONRenderer, CSVRenderer)
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            raise exceptions.NotFound
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            export_lines(kind, renderer.format),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{kind}.{renderer.format}"'
+        )
+        return response
@@ -0,0 +1,129 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+
+
+class CacheNamespace:
+    """
+    Пространство имен кэша.
+
+    Добавляет к ключам префикс пространства и берет из настройки
+    CACHE_NAMESPACES кэш (ALIAS), время жизни (TIMEOUT) и версию ключей
+    (VERSION). Увеличение версии сбрасывает все ключи пространства.
+    Если включена настройка CACHE_METRICS, считает попадания и промахи.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def options(self):
+        return settings.CACHE_NAMESPACES.get(self.name, {})
+
+    @property
+    def cache(self):
+        return caches[self.options.get('ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return self.options.get('TIMEOUT', settings.CACHE_DEFAULT_TIMEOUT)
+
+    @property
+    def version(self):
+        return self.options.get('VERSION')
+
+    def make_key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key, default=None):
+        """
+        Возвращает значение по ключу и учитывает попадание или промах.
+        """
+        value = self.cache.get(self.make_key(key), version=self.version)
+        outcome = 'hit' if value is not None else 'miss'
+        metrics.record_cache(outcome)
+        self.record(outcome)
+        if value is None:
+            return default
+        return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        self.cache.set(
+            self.make_key(key), value, timeout, version=self.version
+        )
+
+    def delete(self, *keys):
+        self.cache.delete_many(
+            [self.make_key(key) for key in keys], version=self.version
+        )
+
+    def record(self, outcome):
+        """
+        Увеличивает счетчик попаданий или промахов пространства.
+        """
+        if not settings.CACHE_METRICS:
+            return
+        key = f'metrics:{self.name}:{outcome}'
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def stats(self):
+        """
+        Возвращает счетчики попаданий и промахов пространства.
+        """
+        values = self.cache.get_many(
+            [f'metrics:{self.name}:hit', f'metrics:{self.name}:miss']
+        )
+        return {
+            'hits': values.get(f'metrics:{self.name}:hit', 0),
+            'misses': values.get(f'metrics:{self.name}:miss', 0),
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many(
+            [f'metrics:{self.name}:hit', f'metrics:{self.name}:miss']
+        )
+
+
+generations = CacheNamespace('generations')
+
+
+def get_generation(*scopes):
+    """
+    Возвращает поколение данных для областей scopes.
+
+    Поколение входит в ключ кэша фрагмента: после сброса любой из
+    областей фрагмент получает новый ключ, а старое значение больше
+    не читается.
+    """
+    keys = [generations.make_key(scope) for scope in scopes]
+    values = generations.cache.get_many(keys, version=generations.version)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in values}
+    if missing:
+        generations.cache.set_many(
+            missing, generations.timeout, version=generations.version
+        )
+        values.update(missing)
+    return '-'.join(values[key] for key in keys)
+
+
+def bump_generation(*scopes):
+    """
+    Сбрасывает поколения областей scopes сейчас и еще раз после фиксации
+    текущей транзакции.
+
+    Параллельный запрос может до фиксации прочитать прежние строки
+    и сохранить фрагмент под новым поколением: повторный сброс после
+    фиксации отбрасывает такой фрагмент.
+    """
+    generations.delete(*scopes)
+    if scopes and transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: generations.delete(*scopes))
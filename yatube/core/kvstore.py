@@ -0,0 +1,39 @@
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """
+    Хранилище ключей sorl-thumbnail с пакетным чтением.
+
+    Метод get_many читает записи о нескольких миниатюрах одним запросом
+    к кэшу и, для промахов, одним запросом к базе данных.
+    """
+
+    def get_many(self, image_files):
+        """
+        Возвращает сохраненные миниатюры по ключам файлов image_files.
+        """
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        if not keys:
+            return {}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(key__in=missing)
+                         .values_list('key', 'value'))
+            fetched = {
+                key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }
+            self.cache.set_many(fetched, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {
+            keys[key]: deserialize_image_file(value)
+            for key, value in values.items()
+            if value and value != cached_db_kvstore.EMPTY_VALUE
+        }
@@ -0,0 +1,261 @@
+import json
+import math
+import platform
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Comment, Group, Post, Tag
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    """
+    Возвращает перцентиль списка значений (ближайший ранг).
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера производительности HTML-страниц и API.
+
+    Каждый маршрут запрашивается тестовым клиентом несколько раз;
+    для маршрута считаются перцентили p50 и p95 времени ответа, число
+    SQL-запросов и пиковая память на запрос (отдельным проходом под
+    tracemalloc, чтобы трассировка не искажала время). Результат
+    выводится в JSON для сравнения между версиями.
+    Данные для замера готовит команда generate_data.
+    """
+    help = 'Замеряет время ответа, число запросов и память по маршрутам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Число замеряемых запросов на маршрут'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Число прогревочных запросов на маршрут'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--route',
+            action='append',
+            dest='routes',
+            help='Замерять только указанные маршруты'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата (по умолчанию - стандартный вывод)'
+        )
+
+    def handle(self, *args, **options):
+        self.cold = options['cold']
+        routes = self.get_routes()
+        if options['routes']:
+            unknown = set(options['routes']) - set(routes)
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные маршруты: {", ".join(sorted(unknown))}'
+                )
+            routes = {name: routes[name] for name in options['routes']}
+        results = {
+            name: self.measure(
+                client, url, options['requests'], options['warmup']
+            )
+            for name, (client, url) in routes.items()
+        }
+        report = json.dumps({
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': self.cold,
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+            },
+            'routes': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def get_routes(self):
+        """
+        Возвращает замеряемые маршруты: {название: (клиент, адрес)}.
+
+        В качестве объектов берутся самые нагруженные: автор с наибольшим
+        числом постов, группа с наибольшим числом постов, пост с
+        наибольшим числом комментариев, пользователь с наибольшим числом
+        подписок и самый популярный тег. Маршруты тегов, веток
+        комментариев и выгрузки замеряются, только если есть тег,
+        комментарий поста и активный сотрудник соответственно.
+        """
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        author = (User.objects.filter(stats__isnull=False)
+                  .order_by('-stats__posts_count').first())
+        group = (Group.objects.annotate(posts_count=Count('posts'))
+                 .order_by('-posts_count').first())
+        reader = (User.objects.annotate(following_count=Count('follower'))
+                  .order_by('-following_count').first())
+        if not (post and author and group and reader):
+            raise CommandError(
+                'Недостаточно данных, выполните команду generate_data'
+            )
+        anonymous = Client()
+        client = Client()
+        client.force_login(reader)
+        api = Client(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(reader)}'
+        )
+        last_page = max(1, Post.objects.count() // settings.POSTS_PER_PAGE)
+        post_url = f'/api/v1/posts/{post.pk}/'
+        routes = {
+            'index': (anonymous, reverse('posts:index')),
+            'index_deep_page': (
+                anonymous, f'{reverse("posts:index")}?page={last_page}'
+            ),
+            'index_search': (
+                anonymous, f'{reverse("posts:index")}?q={post.text.split()[0]}'
+            ),
+            'group_list': (anonymous, reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            )),
+            'profile': (anonymous, reverse(
+                'posts:profile', kwargs={'username': author.username}
+            )),
+            'post_detail': (anonymous, reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            )),
+            'follow_index': (client, reverse('posts:follow_index')),
+            'api_posts': (api, '/api/v1/posts/'),
+            'api_posts_offset': (api, '/api/v1/posts/?limit=10&offset=1000'),
+            'api_post_detail': (api, post_url),
+            'api_comments': (api, f'{post_url}comments/'),
+            'api_groups': (api, '/api/v1/groups/'),
+            'api_group_detail': (api, f'/api/v1/groups/{group.pk}/'),
+            'api_follow': (api, '/api/v1/follow/'),
+            'api_users_me': (api, '/api/v1/users/me/'),
+            'tag_list': (anonymous, reverse('posts:tag_list')),
+            'post_comments': (anonymous, reverse(
+                'posts:post_comments', kwargs={'post_id': post.pk}
+            )),
+            'api_comments_tree': (api, f'{post_url}comments/tree/'),
+        }
+        skipped = []
+        tag = Tag.objects.order_by('-posts_count', 'name').first()
+        if tag:
+            routes['tag_posts'] = (anonymous, reverse(
+                'posts:tag_posts', kwargs={'name': tag.name}
+            ))
+        else:
+            skipped.append('tag_posts')
+        comment = (Comment.objects.filter(post=post, parent__isnull=True)
+                   .order_by('pk').first())
+        if comment:
+            routes['comment_thread'] = (anonymous, reverse(
+                'posts:comment_thread',
+                kwargs={'post_id': post.pk, 'comment_id': comment.pk}
+            ))
+            routes['api_comment_thread'] = (
+                api, f'{post_url}comments/{comment.pk}/thread/'
+            )
+        else:
+            skipped += ['comment_thread', 'api_comment_thread']
+        staff = User.objects.filter(is_staff=True, is_active=True).first()
+        if staff:
+            admin = Client(
+                HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(staff)}'
+            )
+            routes['api_export_posts'] = (admin, '/api/v1/export/posts/')
+            routes['api_export_comments'] = (
+                admin, '/api/v1/export/comments/?format=csv'
+            )
+        else:
+            skipped += ['api_export_posts', 'api_export_comments']
+        if skipped:
+            self.stderr.write(
+                f'Нет данных для маршрутов: {", ".join(skipped)}'
+            )
+        return routes
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        if response.streaming:
+            # Потоковый ответ (выгрузка) формируется только при чтении.
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def clear_caches(self):
+        """
+        Очищает кэши перед запросом при замере холодного старта.
+        """
+        if self.cold:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+
+    def measure(self, client, url, requests, warmup):
+        """
+        Замеряет маршрут и возвращает его показатели.
+        """
+        for _ in range(warmup):
+            self.request(client, url)
+        timings, queries = [], []
+        for _ in range(requests):
+            self.clear_caches()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                self.request(client, url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(max(1, requests // 10)):
+                self.clear_caches()
+                tracemalloc.reset_peak()
+                self.request(client, url)
+                peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        finally:
+            tracemalloc.stop()
+        return {
+            'url': url,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': max(queries),
+            'queries_p50': percentile(queries, 0.5),
+            'memory_peak_kb': round(percentile(peaks, 0.5), 1),
+        }
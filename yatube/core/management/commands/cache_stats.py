@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cache import CacheNamespace
+
+
+class Command(BaseCommand):
+    """
+    Команда для вывода статистики попаданий в кэш по пространствам имен.
+    """
+    help = 'Выводит число попаданий и промахов кэша по пространствам имен'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Сбросить счетчики после вывода'
+        )
+
+    def handle(self, *args, **options):
+        for name in settings.CACHE_NAMESPACES:
+            namespace = CacheNamespace(name)
+            stats = namespace.stats()
+            total = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / total if total else 0
+            self.stdout.write(
+                f'{name}: попаданий {stats["hits"]}, '
+                f'промахов {stats["misses"]}, доля попаданий {ratio:.0%}'
+            )
+            if options['reset']:
+                namespace.reset_stats()
@@ -0,0 +1,237 @@
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм: число запросов и время в миллисекундах.
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Методы, бюджеты запросов которых проверяются.
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса: число и время SQL-запросов, обращения
+    к кэшу и время рендеринга шаблонов (если templates).
+    """
+
+    def __init__(self, templates=False):
+        self.templates = templates
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.started = time.perf_counter()
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Обертка выполнения SQL (connection.execute_wrapper).
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+    def server_timing(self):
+        """
+        Возвращает значение заголовка Server-Timing.
+        """
+        timing = [
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+        ]
+        if self.templates:
+            timing.append(f'tpl;dur={self.template_time * 1000:.1f}')
+        timing.append(f'total;dur={self.total_time * 1000:.1f}')
+        return ', '.join(timing)
+
+
+def start(metrics):
+    """
+    Начинает (или продолжает) сбор метрик metrics в текущем запросе.
+    """
+    return _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    """
+    Возвращает метрики текущего запроса или None вне запроса.
+    """
+    return _current.get()
+
+
+def record_cache(outcome):
+    """
+    Учитывает попадание ('hit') или промах ('miss') кэша в текущем запросе.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if outcome == 'hit':
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def instrument_templates():
+    """
+    Подключает учет времени рендеринга шаблонов к Template.render.
+
+    Учитывается только внешний шаблон, поэтому время вложенных
+    шаблонов (include, extends) не суммируется повторно. Время считается
+    только для запросов, метрики которых созданы с templates.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    def instrumented_render(self, context):
+        metrics = _current.get()
+        if metrics is None or not metrics.templates:
+            return render(self, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+    instrumented_render.instrumented = True
+    Template.render = instrumented_render
+
+
+class Histogram:
+    """
+    Скользящая гистограмма значений по последним window наблюдениям.
+    """
+
+    def __init__(self, buckets, window):
+        self.buckets = buckets
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def percentile(self, percent, values):
+        if not values:
+            return 0
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+    def summary(self):
+        values = sorted(self.values)
+        counts = [0] * (len(self.buckets) + 1)
+        for value in values:
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+        labels = [f'<={bound}' for bound in self.buckets]
+        labels.append(f'>{self.buckets[-1]}')
+        return {
+            'count': len(values),
+            'p50': self.percentile(50, values),
+            'p95': self.percentile(95, values),
+            'max': values[-1] if values else 0,
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+class MetricsRegistry:
+    """
+    Хранилище гистограмм метрик по именам представлений в памяти процесса.
+    """
+    fields = {
+        'queries': QUERY_BUCKETS,
+        'sql_ms': TIME_BUCKETS,
+        'template_ms': TIME_BUCKETS,
+        'total_ms': TIME_BUCKETS,
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(self.create)
+
+    def create(self):
+        window = settings.REQUEST_METRICS_WINDOW
+        return {
+            name: Histogram(buckets, window)
+            for name, buckets in self.fields.items()
+        }
+
+    def add(self, view_name, metrics):
+        values = {
+            'queries': metrics.queries,
+            'sql_ms': metrics.sql_time * 1000,
+            'template_ms': metrics.template_time * 1000,
+            'total_ms': metrics.total_time * 1000,
+        }
+        with self.lock:
+            histograms = self.views[view_name]
+            for name, value in values.items():
+                histograms[name].add(value)
+
+    def summary(self):
+        with self.lock:
+            return {
+                view_name: {
+                    name: histogram.summary()
+                    for name, histogram in histograms.items()
+                }
+                for view_name, histograms in self.views.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def check_budget(view_name, method, metrics, action=None):
+    """
+    Сравнивает число запросов с бюджетом представления.
+
+    Бюджеты задаются настройкой QUERY_BUDGETS ({view_name: число}) для
+    чтения: запросы с другими методами (POST, PUT, DELETE) не проверяются,
+    их изменения к этому моменту уже записаны. При превышении пишется
+    предупреждение в лог, а если action (по умолчанию QUERY_BUDGET_ACTION)
+    равно 'raise' - выбрасывается QueryBudgetExceeded.
+    """
+    if method not in SAFE_METHODS:
+        return
+    budget = settings.QUERY_BUDGETS.get(view_name)
+    if budget is None or metrics.queries <= budget:
+        return
+    message = (f'Представление {view_name} выполнило {metrics.queries} '
+               f'запросов при бюджете {budget}')
+    if (action or settings.QUERY_BUDGET_ACTION) == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
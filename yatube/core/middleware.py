@@ -0,0 +1,74 @@
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware для сбора метрик запроса.
+
+    Считает SQL-запросы и их время, обращения к кэшу и время рендеринга
+    шаблонов (REQUEST_METRICS_TEMPLATES), добавляет их в гистограммы
+    по имени представления и в заголовок Server-Timing (SERVER_TIMING).
+    Проверяет бюджеты запросов QUERY_BUDGETS. Метрики потоковых ответов
+    записываются после передачи тела, когда выполнены все их запросы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.REQUEST_METRICS and settings.REQUEST_METRICS_TEMPLATES:
+            metrics.instrument_templates()
+
+    def __call__(self, request):
+        if not settings.REQUEST_METRICS:
+            return self.get_response(request)
+        request_metrics = metrics.RequestMetrics(
+            settings.REQUEST_METRICS_TEMPLATES
+        )
+        with self.collect(request_metrics):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, request_metrics, response.streaming_content
+            )
+            return response
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = request_metrics.server_timing()
+        self.record(request, request_metrics)
+        return response
+
+    @contextmanager
+    def collect(self, request_metrics):
+        token = metrics.start(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics)
+                    )
+                yield
+        finally:
+            metrics.stop(token)
+
+    def stream(self, request, request_metrics, content):
+        """
+        Передает тело потокового ответа, продолжая сбор метрик.
+
+        Заголовки к этому моменту отправлены, поэтому превышение бюджета
+        только пишется в лог.
+        """
+        with self.collect(request_metrics):
+            yield from content
+        self.record(request, request_metrics, action='log')
+
+    def record(self, request, request_metrics, action=None):
+        match = request.resolver_match
+        if match is None:
+            return
+        metrics.registry.add(match.view_name, request_metrics)
+        metrics.check_budget(
+            match.view_name, request.method, request_metrics, action
+        )
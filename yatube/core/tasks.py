@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.db import connections, transaction
+
+_executors = {}
+_lock = Lock()
+
+
+def get_executor(name, workers):
+    """
+    Возвращает пул из workers потоков с названием name.
+    """
+    with _lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix=name
+            )
+        return _executors[name]
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(name, workers, func, *args):
+    """
+    Ставит вызов func(*args) в пул потоков name после фиксации транзакции.
+
+    При workers = 0 функция вызывается сразу, в текущем потоке.
+    """
+    if not workers:
+        func(*args)
+        return
+    transaction.on_commit(
+        lambda: get_executor(name, workers).submit(_run, func, *args)
+    )
@@ -0,0 +1,63 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import CacheNamespace, get_generation
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, namespace, vary_on, generation=None):
+        self.nodelist = nodelist
+        self.namespace = namespace
+        self.vary_on = vary_on
+        self.generation = generation
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        if self.generation is not None:
+            scopes = self.generation.resolve(context)
+            if isinstance(scopes, str):
+                scopes = (scopes,)
+            vary_on.append(get_generation(*scopes))
+        key = make_template_fragment_key(self.namespace.name, vary_on)
+        value = self.namespace.get(key)
+        if value is None:
+            value = self.nodelist.render(context)
+            self.namespace.set(key, value)
+        return value
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """
+    Тег для кэширования фрагмента шаблона в пространстве имен кэша.
+
+    Время жизни и версия ключей берутся из настройки CACHE_NAMESPACES,
+    попадания и промахи учитываются для каждого пространства.
+    Аргумент generation задает область данных (или список областей):
+    фрагмент сбрасывается, когда сбрасывается поколение любой из них.
+
+    Использование:
+        {% fragment_cache post_list page_obj.number generation='index' %}
+            ...
+        {% endfragment_cache %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f'Тег {tokens[0]} требует имя пространства кэша'
+        )
+    generation = None
+    if tokens[-1].startswith('generation='):
+        generation = parser.compile_filter(
+            tokens.pop()[len('generation='):]
+        )
+    return FragmentCacheNode(
+        nodelist,
+        CacheNamespace(tokens[1]),
+        [parser.compile_filter(token) for token in tokens[2:]],
+        generation
+    )
@@ -25,3 +25,30 @@ def if_empty(var1, var2):
     if not var1:
         return var2
     return var1
+
+
+@register.filter
+def srcset(variants):
+    """
+    Фильтр, составляющий значение атрибута srcset.
+
+    Принимает список пар [ширина, адрес] и возвращает строку
+    вида 'адрес 320w, адрес 640w'.
+    """
+    return ', '.join(f'{url} {width}w' for width, url in variants)
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """
+    Тег, возвращающий строку запроса для ссылки пагинатора.
+
+    Сохраняет параметры текущего запроса (например, q), кроме номера
+    страницы и курсора, и добавляет к ним params.
+    """
+    query = context['request'].GET.copy()
+    for key in ('page', 'cursor'):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return f'?{query.urlencode()}'
@@ -1,5 +1,33 @@
+import io
+import json
+import os
+import runpy
+import shutil
+import struct
+import tempfile
+import zlib
 from http import HTTPStatus
-from django.test import Client, TestCase
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.cache import CacheNamespace, bump_generation, get_generation
+from core.metrics import QueryBudgetExceeded, registry
+from posts.models import Comment, Post
+from posts.tags import set_post_tags
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class CoreViewTest(TestCase):
@@ -10,4 +38,297 @@ class CoreViewTest(TestCase):
         """Проверка page_not_found"""
         response = self.client.get('/unexisting-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
-        self.assertTemplateUsed(response, 'core/404.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'core/404.html')
+
+
+class CacheNamespaceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.namespace = CacheNamespace('test')
+
+    @override_settings(CACHE_METRICS=True)
+    def test_hits_and_misses(self):
+        """Попадания и промахи учитываются по пространству имен."""
+        self.assertIsNone(self.namespace.get('key'))
+        self.namespace.set('key', 'value')
+        self.assertEqual(self.namespace.get('key'), 'value')
+        self.assertEqual(self.namespace.get('key'), 'value')
+        self.assertEqual(self.namespace.stats(), {'hits': 2, 'misses': 1})
+
+    def test_metrics_disabled_by_default(self):
+        """Без CACHE_METRICS чтение из кэша не считается."""
+        self.namespace.get('key')
+        self.assertEqual(self.namespace.stats(), {'hits': 0, 'misses': 0})
+
+    def test_unknown_backend(self):
+        """Неизвестный CACHE_BACKEND сообщает допустимые значения."""
+        path = os.path.join(settings.BASE_DIR, 'yatube', 'settings.py')
+        with mock.patch.dict(os.environ, {'CACHE_BACKEND': 'memcache'}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'redis'):
+                runpy.run_path(path)
+
+    def test_namespace_options(self):
+        """Время жизни и версия берутся из CACHE_NAMESPACES."""
+        self.namespace.set('key', 'value')
+        options = {'test': {'TIMEOUT': 1, 'VERSION': 2}}
+        with self.settings(CACHE_NAMESPACES=options):
+            self.assertEqual(self.namespace.timeout, 1)
+            self.assertIsNone(self.namespace.get('key'))
+
+    def test_bump_generation_after_commit(self):
+        """Поколение сбрасывается еще раз после фиксации транзакции."""
+        first = get_generation('scope')
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_generation('scope')
+            second = get_generation('scope')
+        self.assertNotEqual(second, first)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(get_generation('scope'), second)
+
+    def test_fragment_cache_tag(self):
+        """Тег fragment_cache кэширует фрагмент по значениям аргументов."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache test key %}{{ value }}{% endfragment_cache %}'
+        )
+        render = template.render
+        self.assertEqual(render(Context({'key': 1, 'value': 'a'})), 'a')
+        self.assertEqual(render(Context({'key': 1, 'value': 'b'})), 'a')
+        self.assertEqual(render(Context({'key': 2, 'value': 'b'})), 'b')
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+
+    @override_settings(SERVER_TIMING=True, REQUEST_METRICS_TEMPLATES=True)
+    def test_server_timing_header(self):
+        """Ответ содержит метрики запроса в заголовке Server-Timing."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'cache;desc=', 'tpl;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertNotIn('tpl;dur=0.0', timing)
+
+    def test_server_timing_disabled_by_default(self):
+        """По умолчанию заголовок Server-Timing и время шаблонов выключены."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        summary = registry.summary()['posts:index']
+        self.assertEqual(summary['template_ms']['max'], 0)
+
+    def test_histogram_by_view_name(self):
+        """Метрики собираются в гистограммы по имени представления."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        summary = registry.summary()['posts:index']
+        self.assertEqual(summary['queries']['count'], 3)
+        self.assertGreater(summary['queries']['max'], 0)
+        self.assertEqual(sum(summary['total_ms']['buckets'].values()), 3)
+
+    def test_query_budget(self):
+        """Превышение бюджета запросов пишется в лог или вызывает ошибку."""
+        budgets = {'posts:index': 0}
+        with self.settings(QUERY_BUDGETS=budgets):
+            with self.assertLogs('core.metrics', 'WARNING'):
+                self.client.get(reverse('posts:index'))
+            cache.clear()
+            with self.settings(QUERY_BUDGET_ACTION='raise'):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(reverse('posts:index'))
+
+    def test_query_budget_safe_methods(self):
+        """Бюджет не проверяется для записывающих запросов."""
+        user = User.objects.create(username='testuser')
+        self.client.force_login(user)
+        budgets = {'posts:post_create': 0}
+        with self.settings(QUERY_BUDGETS=budgets, QUERY_BUDGET_ACTION='raise'):
+            self.client.post(reverse('posts:post_create'), {'text': 'Текст'})
+        self.assertTrue(Post.objects.filter(text='Текст').exists())
+
+    def test_streaming_response(self):
+        """Метрики потокового ответа записываются после передачи тела."""
+        staff = User.objects.create(username='staff', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.get('/api/v1/export/posts/')
+        self.assertNotIn('api:export', registry.summary())
+        b''.join(response.streaming_content)
+        summary = registry.summary()['api:export']
+        self.assertEqual(summary['queries']['count'], 1)
+        self.assertGreater(summary['queries']['max'], 0)
+
+    def test_metrics_view_for_staff(self):
+        """Гистограммы метрик доступны только сотрудникам."""
+        response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        staff = User.objects.create(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('request_metrics'))
+        self.assertIn('request_metrics', response.json())
+
+
+def make_png(size, name='image.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def make_jpeg(size, segments=0, name='photo.jpg'):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif.get_ifd(0x8825)[2] = (55.0, 45.0, 0.0)
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, 'JPEG', exif=exif)
+    data = buffer.getvalue()
+    # Сегменты APP15 по 64 КБ перед кадром, как у больших профилей ICC.
+    padding = (b'\xff\xef' + struct.pack('>H', 0xffff)
+               + b'\x00' * (0xffff - 2)) * segments
+    return SimpleUploadedFile(name, data[:2] + padding + data[2:],
+                              'image/jpeg')
+
+
+def make_bmp():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, 'BMP')
+    return buffer.getvalue()
+
+
+def make_png_header(width, height):
+    def chunk(kind, data):
+        crc = zlib.crc32(kind + data)
+        return struct.pack('>I', len(data)) + kind + data + struct.pack(
+            '>I', crc
+        )
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b'\x00' * 1024)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageUploadHandlerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Текст', 'image': image}
+        )
+
+    def test_valid_image(self):
+        """Картинка в допустимых пределах сохраняется без изменений."""
+        self.create_post(make_png((40, 30)))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (40, 30))
+
+    def test_rejected_uploads(self):
+        """Не картинки, бомбы распаковки и большие файлы отклоняются."""
+        uploads = {
+            'not image': SimpleUploadedFile(
+                'image.png', b'text' * 100, 'image/png'
+            ),
+            'bomb': SimpleUploadedFile(
+                'bomb.png', make_png_header(30000, 30000), 'image/png'
+            ),
+            'format': SimpleUploadedFile('image.bmp', make_bmp(), 'image/bmp'),
+        }
+        for name, upload in uploads.items():
+            with self.subTest(upload=name):
+                response = self.create_post(upload)
+                self.assertTrue(response.context['form'].errors['image'])
+        with self.settings(IMAGE_UPLOAD_MAX_SIZE=10):
+            response = self.create_post(make_png((40, 30)))
+            self.assertIn(
+                'Размер файла', response.context['form'].errors['image'][0]
+            )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(
+        IMAGE_UPLOAD_MAX_SIDE=100, FILE_UPLOAD_MAX_MEMORY_SIZE=10
+    )
+    def test_downscale_large_image(self):
+        """Большая картинка уменьшается при загрузке."""
+        self.create_post(make_png((300, 150)))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (100, 50))
+
+    def test_long_metadata_before_frame(self):
+        """JPEG с длинными сегментами метаданных до кадра принимается."""
+        self.create_post(make_jpeg((40, 30), segments=5))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (30, 40))
+
+    def test_metadata_removed(self):
+        """EXIF с координатами удаляется, ориентация применяется."""
+        self.create_post(make_jpeg((40, 30)))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (30, 40))
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertNotIn('exif', image.info)
+
+    def test_api_rejected_upload(self):
+        """API возвращает причину отказа в загрузке картинки."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/posts/', {
+            'text': 'Текст',
+            'image': SimpleUploadedFile(
+                'bomb.png', make_png_header(30000, 30000), 'image/png'
+            ),
+        }, format='multipart')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('разрешение', response.json()['image'][0])
+
+
+class BenchmarkCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_benchmark_report(self):
+        """Команда выводит показатели всех маршрутов в JSON."""
+        call_command(
+            'generate_data', users=5, groups=2, posts=15, comments=10,
+            follows=6, seed=1, stdout=io.StringIO()
+        )
+        comment = Comment.objects.order_by('pk').first()
+        Comment.objects.create(
+            post=comment.post, author=comment.author, parent=comment,
+            text='Ответ'
+        )
+        set_post_tags(comment.post, ['бенчмарк'])
+        User.objects.create_user(username='staff', is_staff=True)
+        out = io.StringIO()
+        call_command('benchmark', requests=2, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['posts'], 15)
+        for name in ('follow_index', 'api_comments', 'tag_list',
+                     'tag_posts', 'comment_thread', 'api_comments_tree',
+                     'api_comment_thread', 'api_export_posts',
+                     'api_export_comments'):
+            self.assertIn(name, report['routes'])
+        for route in report['routes'].values():
+            self.assertLessEqual(route['p50_ms'], route['p95_ms'])
+            self.assertGreater(route['queries'], 0)
+            self.assertGreater(route['memory_peak_kb'], 0)
+
+    def test_benchmark_without_data(self):
+        """Без данных команда завершается ошибкой."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark', stdout=io.StringIO())
@@ -0,0 +1,193 @@
+import io
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             StopFutureHandlers)
+from PIL import Image, ImageOps
+
+# Сколько байт начала файла читать в поисках заголовка картинки: в JPEG
+# до кадра могут идти сегменты EXIF, ICC и XMP по 64 КБ каждый.
+HEADER_LIMIT = 1024 * 1024
+
+# Ключи Image.info с метаданными, которые удаляются при загрузке.
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+
+
+class RejectedUpload(UploadedFile):
+    """
+    Отклоненная при загрузке картинка.
+
+    Содержимое не сохраняется, причина отказа хранится в поле error
+    и выводится полем формы или сериализатора как ошибка валидации.
+    """
+
+    def __init__(self, name, content_type, error):
+        super().__init__(io.BytesIO(), name, content_type, 0)
+        self.error = error
+
+
+def check_upload(data):
+    """
+    Вызывает ValidationError, если картинка отклонена при загрузке.
+    """
+    if isinstance(data, RejectedUpload):
+        raise ValidationError(data.error, code='rejected_upload')
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Потоковый обработчик загрузки картинок.
+
+    Обрабатывает файлы полей IMAGE_UPLOAD_FIELDS. По первым байтам
+    проверяет формат (IMAGE_UPLOAD_FORMATS) и число пикселей
+    (IMAGE_UPLOAD_MAX_PIXELS), не дожидаясь конца файла, и прекращает
+    сохранять данные, если проверка не пройдена или файл больше
+    IMAGE_UPLOAD_MAX_SIZE. Данные копятся в памяти до
+    FILE_UPLOAD_MAX_MEMORY_SIZE, затем во временном файле. Метаданные
+    (EXIF с координатами GPS, XMP) удаляются, а картинки со стороной
+    больше IMAGE_UPLOAD_MAX_SIDE уменьшаются один раз при загрузке.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name in settings.IMAGE_UPLOAD_FIELDS
+        if not self.active:
+            return
+        self.error = None
+        self.header = b''
+        self.next_check = 0
+        self.image_format = None
+        self.size = 0
+        self.file = io.BytesIO()
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error:
+            return None
+        self.size += len(raw_data)
+        if self.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            return self.reject(
+                f'Размер файла превышает '
+                f'{settings.IMAGE_UPLOAD_MAX_SIZE // 1024 // 1024} МБ'
+            )
+        if self.image_format is None:
+            self.header += raw_data
+            if len(self.header) >= self.next_check:
+                # Заголовок разбирается заново при каждом удвоении
+                # прочитанного, чтобы длинные сегменты метаданных
+                # не разбирались на каждом куске.
+                self.next_check = 2 * len(self.header)
+                self.check_header()
+            if self.error:
+                return None
+        self.write(raw_data)
+        return None
+
+    def write(self, data):
+        """
+        Записывает данные в память, а после FILE_UPLOAD_MAX_MEMORY_SIZE -
+        во временный файл.
+        """
+        if (isinstance(self.file, io.BytesIO)
+                and self.file.tell() + len(data)
+                > settings.FILE_UPLOAD_MAX_MEMORY_SIZE):
+            spooled = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset,
+                self.content_type_extra
+            )
+            spooled.write(self.file.getvalue())
+            self.file = spooled
+        self.file.write(data)
+
+    def check_header(self):
+        """
+        Проверяет формат и размеры картинки по заголовку файла.
+        """
+        try:
+            with Image.open(io.BytesIO(self.header)) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.reject('Слишком большое разрешение картинки')
+            return
+        except Exception:
+            # Заголовок еще не прочитан целиком или файл не картинка.
+            if len(self.header) >= HEADER_LIMIT:
+                self.reject('Файл не является картинкой')
+            return
+        self.header = b''
+        if image_format not in settings.IMAGE_UPLOAD_FORMATS:
+            self.reject(f'Формат {image_format} не поддерживается')
+        elif width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.reject('Слишком большое разрешение картинки')
+        else:
+            self.image_format = image_format
+
+    def reject(self, error):
+        self.error = error
+        self.file.close()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        if self.error is None and self.image_format is None:
+            self.check_header()
+            if self.image_format is None and self.error is None:
+                self.reject('Файл не является картинкой')
+        if self.error:
+            return RejectedUpload(
+                self.file_name, self.content_type, self.error
+            )
+        self.file.seek(0)
+        cleaned = self.clean_image()
+        if cleaned is not None:
+            self.file.close()
+            self.file = io.BytesIO()
+            self.write(cleaned)
+        size = self.file.tell()
+        self.file.seek(0)
+        if isinstance(self.file, TemporaryUploadedFile):
+            self.file.size = size
+            return self.file
+        return InMemoryUploadedFile(
+            self.file, self.field_name, self.file_name, self.content_type,
+            size, self.charset, self.content_type_extra
+        )
+
+    def clean_image(self):
+        """
+        Удаляет метаданные картинки, применяя ориентацию из EXIF
+        к пикселям, и уменьшает ее, если сторона больше
+        IMAGE_UPLOAD_MAX_SIDE. Возвращает новое содержимое или None, если
+        картинку менять не нужно. Анимированные картинки не изменяются.
+        """
+        max_side = settings.IMAGE_UPLOAD_MAX_SIDE
+        with Image.open(self.file) as image:
+            large = max(image.size) > max_side
+            has_metadata = bool(image.getexif()) or any(
+                key in image.info for key in METADATA_KEYS
+            )
+            if (not (large or has_metadata)
+                    or getattr(image, 'is_animated', False)):
+                return None
+            image_format = image.format
+            options = dict(
+                settings.IMAGE_UPLOAD_SAVE_OPTIONS.get(image_format, {})
+            )
+            if image.info.get('icc_profile'):
+                options['icc_profile'] = image.info['icc_profile']
+            if large:
+                # JPEG сразу декодируется в уменьшенном масштабе.
+                image.draft(image.mode, (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            cleaned = io.BytesIO()
+            image.save(cleaned, image_format, **options)
+        return cleaned.getvalue()
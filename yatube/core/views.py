@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     """
@@ -27,3 +31,13 @@ def csrf_failure(request, reason=''):
     Представление для отображения страницы ошибки CSRF (Недопустимая CSRF токен).
     """
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def request_metrics(request):
+    """
+    Представление для вывода гистограмм метрик запросов по представлениям.
+
+    Доступно только для сотрудников.
+    """
+    return JsonResponse(registry.summary())
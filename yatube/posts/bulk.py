@@ -0,0 +1,146 @@
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.cache import bump_generation
+from . import counters, feed, search
+from .comments import fill_paths
+from .counters import reconcile
+from .signals import reset_post_counts
+
+
+def chunks(iterable, size):
+    """
+    Разбивает итерируемый объект на списки длиной не больше size.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def save_batch(model, objects, **kwargs):
+    """
+    Сохраняет объекты одним bulk_create в отдельной транзакции.
+    """
+    with transaction.atomic():
+        model.objects.bulk_create(objects, **kwargs)
+    return len(objects)
+
+
+def bulk_insert(model, objects):
+    """
+    Сохраняет объекты одним bulk_create и проставляет им id.
+
+    Если база не возвращает id вставленных строк, они вычисляются по
+    наибольшему id в той же транзакции: запись в SQLite выполняется под
+    блокировкой, и строки одной вставки получают id подряд.
+    """
+    with transaction.atomic():
+        model.objects.bulk_create(objects)
+        if objects and objects[0].pk is None:
+            last = model.objects.aggregate(last=Max('pk'))['last']
+            first = last - len(objects) + 1
+            for pk, obj in enumerate(objects, first):
+                obj.pk = pk
+    return objects
+
+
+def posts_created(posts):
+    """
+    Обновляет производные данные после пакетного создания постов, как
+    сигнал post_saved: счетчики авторов, индекс, ленты и кэш.
+    """
+    authors = Counter(post.author_id for post in posts)
+    for author_id, count in authors.items():
+        counters.change_posts_count(author_id, count)
+    search.index_posts(posts)
+    feed.fan_out_posts(posts)
+    for post in posts:
+        reset_post_counts(post, followers=False)
+    bump_generation(*feed.follower_scopes(authors))
+
+
+def posts_updated(posts):
+    """
+    Обновляет производные данные после пакетного изменения постов.
+    """
+    search.index_posts(posts)
+    for post in posts:
+        reset_post_counts(post, followers=False)
+        post.loaded_group_id = post.group_id
+    authors = {post.author_id for post in posts}
+    bump_generation(*feed.follower_scopes(authors))
+
+
+def comments_created(comments):
+    """
+    Обновляет производные данные после пакетного создания комментариев:
+    счетчики комментариев постов и кэш.
+    """
+    posts = Counter(comment.post_id for comment in comments)
+    for post_id, count in posts.items():
+        counters.change_comments_count(post_id, count)
+    comments_updated(comments)
+
+
+def comments_updated(comments):
+    """
+    Сбрасывает кэш постов после пакетного изменения комментариев.
+    """
+    post_ids = {comment.post_id for comment in comments}
+    bump_generation(*(f'post:{post_id}' for post_id in post_ids))
+
+
+def bulk_insert_dated(model, objects, field):
+    """
+    Сохраняет объекты, как bulk_insert, вместе с их датами в поле field
+    с auto_now_add.
+
+    bulk_create проставляет такому полю текущее время, поэтому даты
+    объектов записываются следующим запросом (bulk_update) в той же
+    транзакции.
+    """
+    dates = [getattr(obj, field) for obj in objects]
+    with transaction.atomic():
+        bulk_insert(model, objects)
+        for obj, date in zip(objects, dates):
+            setattr(obj, field, date)
+        model.objects.bulk_update(objects, (field,))
+    return objects
+
+
+def reset_sequences(*models):
+    """
+    Сдвигает последовательности id после вставки объектов с явными id.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived(counters=True, search_index=True, feeds=True):
+    """
+    Пересчитывает производные данные после загрузки в обход сигналов:
+    пути комментариев, счетчики, полнотекстовый индекс и ленты подписок.
+    Кэши очищаются, так как поколения областей при загрузке не
+    сбрасывались.
+    """
+    fill_paths()
+    if counters:
+        reconcile()
+    if search_index:
+        search.rebuild_index()
+    if feeds:
+        feed.rebuild()
+    for alias in settings.CACHES:
+        caches[alias].clear()
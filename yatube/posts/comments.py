@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import CharField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from .models import Comment
+from .paginator import get_lazy_page, get_page
+
+# Комментарии поста упорядочиваются по ключу индекса (post, -created, -id).
+COMMENT_ORDERING = ('-created', '-pk')
+
+# Ветки упорядочиваются по пути: ответы идут за родителем по порядку id.
+THREAD_ORDERING = ('path',)
+
+
+def get_comments_page(request, post, lazy=False):
+    """
+    Возвращает страницу веток комментариев поста по курсору из запроса.
+
+    Страница состоит из комментариев верхнего уровня. Авторы загружаются
+    тем же запросом, страница читается по индексу (post, depth, -created,
+    -id), а общее количество не считается, поэтому время не зависит от
+    числа комментариев. При lazy страница читается при первом обращении
+    (get_lazy_page), чтобы при попадании в кэш фрагмента запросов не было.
+    """
+    comments = (Comment.objects.filter(post=post, depth=0)
+                .select_related('author'))
+    return (get_lazy_page if lazy else get_page)(
+        request,
+        comments,
+        per_page=settings.COMMENTS_PER_PAGE,
+        ordering=COMMENT_ORDERING,
+        exact_count=False
+    )
+
+
+def subtree(comment, depth=None, include_self=False):
+    """
+    Возвращает условие на ответы комментария comment не глубже depth
+    уровней (с самим комментарием, если include_self).
+
+    Пути ответов начинаются с пути комментария и состоят из цифр, поэтому
+    лежат в диапазоне от пути комментария до него же с ':' (символ
+    после '9').
+    """
+    lookup = 'path__gte' if include_self else 'path__gt'
+    condition = Q(**{lookup: comment.path}, path__lt=comment.path + ':')
+    if depth is not None:
+        condition &= Q(depth__lte=comment.depth + depth)
+    return condition
+
+
+def get_threads(comments, depth=None):
+    """
+    Возвращает комментарии comments, за каждым из которых идут его ответы
+    не глубже depth уровней в порядке ветки.
+
+    Ответы всех комментариев читаются одним запросом по индексу путей.
+    Каждому комментарию задается level - глубина относительно своего
+    комментария из comments.
+    """
+    comments = list(comments)
+    if not comments:
+        return []
+    condition = Q()
+    for comment in comments:
+        condition |= subtree(comment, depth)
+    replies = (Comment.objects
+               .filter(condition, post_id=comments[0].post_id)
+               .select_related('author')
+               .order_by(*THREAD_ORDERING))
+    threads = {comment.path: [comment] for comment in comments}
+    lengths = sorted({len(path) for path in threads})
+    for reply in replies:
+        for length in lengths:
+            thread = threads.get(reply.path[:length])
+            if thread is not None:
+                reply.level = reply.depth - thread[0].depth
+                thread.append(reply)
+                break
+    result = []
+    for comment in comments:
+        comment.level = 0
+        result.extend(threads[comment.path])
+    return result
+
+
+def validate_parent(parent, post_id):
+    """
+    Проверяет, что на комментарий parent можно ответить под постом post_id.
+    """
+    if parent is None:
+        return
+    if parent.post_id != int(post_id):
+        raise ValidationError('Комментарий относится к другому посту')
+    if parent.depth >= settings.COMMENT_MAX_DEPTH:
+        raise ValidationError('Достигнута наибольшая глубина ветки')
+
+
+def set_paths(comments):
+    """
+    Записывает пути комментариям, созданным bulk_create, когда известны
+    их id. Глубина (get_depth) задается до вставки.
+    """
+    for comment in comments:
+        comment.path = comment.get_path()
+    Comment.objects.bulk_update(comments, ('path',))
+
+
+def fill_paths():
+    """
+    Задает пути и глубину комментариям, загруженным в обход save.
+
+    Сначала пути получают комментарии верхнего уровня, затем по одному
+    уровню за запрос - ответы, у родителей которых путь уже есть.
+    """
+    segment = LPad(Cast('pk', CharField()), Comment.PATH_WIDTH, Value('0'))
+    Comment.objects.filter(path='', parent=None).update(path=segment, depth=0)
+    parent = Comment.objects.filter(pk=OuterRef('parent_id'))
+    while Comment.objects.filter(path='', parent__path__gt='').update(
+        path=Concat(Subquery(parent.values('path')[:1]), segment,
+                    output_field=CharField()),
+        depth=Subquery(parent.values('depth')[:1]) + 1
+    ):
+        pass
+
+
+def comment_data(comment):
+    """
+    Возвращает данные комментария для JSON-ответа.
+    """
+    author = comment.author
+    return {
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': author.username,
+        'author_name': author.get_full_name() or author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
@@ -0,0 +1,124 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, Tag, TagPost
+from .tags import tags_cache
+
+
+def create_stats(user_id):
+    """
+    Создает счетчики автора по фактическому количеству постов
+    и подписчиков, если их еще нет, и возвращает их.
+
+    Строка вставляется одним запросом без точки сохранения: если ее
+    успел создать другой запрос, вставка пропускается.
+    """
+    stats = AuthorStats(
+        user_id=user_id,
+        posts_count=Post.objects.filter(author_id=user_id).count(),
+        followers_count=Follow.objects.filter(following_id=user_id).count()
+    )
+    AuthorStats.objects.bulk_create([stats], ignore_conflicts=True)
+    return stats
+
+
+def change_posts_count(user_id, delta):
+    """
+    Изменяет счетчик постов автора на delta.
+
+    Если счетчика еще нет, он создается по фактическому количеству постов.
+    """
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        posts_count=F('posts_count') + delta
+    )
+    if not updated:
+        create_stats(user_id)
+
+
+def change_followers_count(user_id, delta):
+    """
+    Изменяет счетчик подписчиков автора на delta.
+
+    Если счетчика еще нет, он создается по фактическому количеству
+    подписчиков.
+    """
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        followers_count=F('followers_count') + delta
+    )
+    if not updated and delta > 0:
+        create_stats(user_id)
+
+
+def change_comments_count(post_id, delta):
+    """
+    Изменяет счетчик комментариев поста на delta.
+    """
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def get_posts_count(user):
+    """
+    Возвращает количество постов автора из счетчика.
+    """
+    try:
+        return user.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        return create_stats(user.pk).posts_count
+
+
+def reconcile():
+    """
+    Пересчитывает все счетчики по фактическим данным.
+
+    Возвращает количество исправленных счетчиков постов, авторов (постов
+    и подписчиков) и тегов.
+    """
+    comments = (Comment.objects.filter(post=OuterRef('pk'))
+                .order_by().values('post')
+                .annotate(count=Count('pk')).values('count'))
+    actual = Coalesce(Subquery(comments), 0)
+    posts_fixed = (Post.objects.annotate(actual=actual)
+                   .exclude(comments_count=F('actual'))
+                   .update(comments_count=actual))
+    posts = dict(
+        Post.objects.order_by().values_list('author')
+        .annotate(count=Count('pk'))
+    )
+    followers = dict(
+        Follow.objects.order_by().values_list('following')
+        .annotate(count=Count('pk'))
+    )
+    stats = {
+        user_id: (posts_count, followers_count)
+        for user_id, posts_count, followers_count in
+        AuthorStats.objects.values_list(
+            'user', 'posts_count', 'followers_count'
+        )
+    }
+    changed = [
+        AuthorStats(user_id=user_id, posts_count=posts.get(user_id, 0),
+                    followers_count=followers.get(user_id, 0))
+        for user_id in set(posts) | set(followers) | set(stats)
+        if (posts.get(user_id, 0), followers.get(user_id, 0))
+        != stats.get(user_id)
+    ]
+    AuthorStats.objects.bulk_create(
+        [stat for stat in changed if stat.user_id not in stats]
+    )
+    AuthorStats.objects.bulk_update(
+        [stat for stat in changed if stat.user_id in stats],
+        ('posts_count', 'followers_count'),
+        batch_size=500
+    )
+    tagged = (TagPost.objects.filter(tag=OuterRef('pk'))
+              .order_by().values('tag')
+              .annotate(count=Count('pk')).values('count'))
+    actual = Coalesce(Subquery(tagged), 0)
+    tags_fixed = (Tag.objects.annotate(actual=actual)
+                  .exclude(posts_count=F('actual'))
+                  .update(posts_count=actual))
+    if tags_fixed:
+        tags_cache.delete('cloud')
+    return posts_fixed, len(changed), tags_fixed
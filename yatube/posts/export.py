@@ -0,0 +1,94 @@
+import csv
+import json
+from datetime import datetime
+
+from .models import Comment, Follow, Post, TagPost
+
+# Выгружаемые данные: {название: (модель, {поле выгрузки: поле модели})}.
+# Поля совпадают с форматом команды import_data.
+EXPORTS = {
+    'posts': (Post, {
+        'id': 'pk',
+        'text': 'text',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'pub_date': 'pub_date',
+    }),
+    'comments': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'parent': 'parent_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'user': 'user__username',
+        'following': 'following__username',
+    }),
+    'tags': (TagPost, {
+        'post': 'post_id',
+        'tag': 'tag__name',
+    }),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    Псевдофайл, метод write которого возвращает записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_rows(kind, chunk_size=CHUNK_SIZE):
+    """
+    Возвращает строки выгрузки kind в порядке id.
+
+    Строки читаются курсором пачками по chunk_size, поэтому память не
+    зависит от объема выгрузки.
+    """
+    model, fields = EXPORTS[kind]
+    return (model.objects.order_by('pk')
+            .values_list(*fields.values())
+            .iterator(chunk_size=chunk_size))
+
+
+def prepare(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def ndjson_lines(kind, chunk_size=CHUNK_SIZE):
+    """
+    Возвращает выгрузку kind в формате NDJSON построчно.
+    """
+    names = tuple(EXPORTS[kind][1])
+    for row in get_rows(kind, chunk_size):
+        record = dict(zip(names, map(prepare, row)))
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_lines(kind, chunk_size=CHUNK_SIZE):
+    """
+    Возвращает выгрузку kind в формате CSV с заголовком построчно.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORTS[kind][1])
+    for row in get_rows(kind, chunk_size):
+        yield writer.writerow(map(prepare, row))
+
+
+def export_lines(kind, file_format, chunk_size=CHUNK_SIZE):
+    """
+    Возвращает строки выгрузки kind в формате file_format.
+    """
+    if file_format == 'csv':
+        return csv_lines(kind, chunk_size)
+    return ndjson_lines(kind, chunk_size)
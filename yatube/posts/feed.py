@@ -0,0 +1,211 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from core.cache import bump_generation
+from core.tasks import run_after_commit
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+FEED_ORDERING = ('-feed_pub_date', '-feed_post')
+
+
+def get_celebrity_ids(author_ids=None):
+    """
+    Возвращает множество id авторов из author_ids (по умолчанию всех),
+    посты которых не раскладываются по лентам.
+
+    Это авторы, у которых подписчиков больше FEED_FANOUT_LIMIT по счетчику
+    AuthorStats.followers_count, поэтому проверяются только переданные
+    авторы. Их посты подмешиваются в ленту при чтении (fan-out on read).
+    """
+    stats = AuthorStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    )
+    if author_ids is not None:
+        stats = stats.filter(user__in=author_ids)
+    return set(stats.values_list('user', flat=True))
+
+
+def is_celebrity(author):
+    """
+    Проверяет, читается ли лента автора без раскладки (fan-out on read).
+    """
+    return author.pk in get_celebrity_ids((author.pk,))
+
+
+def backfill(user_ids, author_id):
+    """
+    Добавляет в ленты пользователей user_ids последние посты автора.
+    """
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    )
+    for user_id in user_ids:
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(user_id=user_id, post_id=post_id,
+                       author_id=author_id, pub_date=pub_date)
+             for post_id, pub_date in posts],
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+    bump_generation(*(f'follow:{user_id}' for user_id in user_ids))
+
+
+def rebuild():
+    """
+    Заново строит материализованные ленты всех пользователей.
+
+    Нужна после загрузки постов и подписок в обход сигналов (bulk_create).
+    Ленты заполняются одним запросом INSERT ... SELECT: каждому подписчику
+    достаются последние FEED_BACKFILL_SIZE постов автора, как при backfill.
+    """
+    celebrities = get_celebrity_ids()
+    FeedEntry.objects.all().delete()
+    exclude = ', '.join(['%s'] * len(celebrities))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            'INNER JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER '
+            '(PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS rank '
+            f'FROM {Post._meta.db_table}) post '
+            'ON post.author_id = follow.following_id '
+            'WHERE post.rank <= %s'
+            + (f' AND follow.following_id NOT IN ({exclude})'
+               if celebrities else ''),
+            [settings.FEED_BACKFILL_SIZE, *celebrities]
+        )
+    bump_generation(*(
+        f'follow:{user_id}' for user_id in
+        Follow.objects.values_list('user', flat=True).distinct()
+    ))
+
+
+def follower_scopes(author_ids):
+    """
+    Возвращает области кэша лент подписчиков авторов author_ids.
+    """
+    followers = (Follow.objects.filter(following__in=author_ids)
+                 .values_list('user', flat=True).distinct())
+    return [f'follow:{user_id}' for user_id in followers]
+
+
+def fan_out_post(post):
+    """
+    Раскладывает новый пост по лентам подписчиков автора.
+
+    При FEED_WORKERS > 0 раскладка выполняется в фоне после фиксации
+    транзакции, иначе сразу.
+    """
+    run_after_commit('feed', settings.FEED_WORKERS, fan_out_posts, (post,))
+
+
+def fan_out_posts(posts):
+    """
+    Раскладывает новые посты по лентам подписчиков их авторов.
+
+    Подписчики читаются одним запросом на всех авторов, кроме авторов
+    без раскладки.
+    """
+    author_ids = {post.author_id for post in posts}
+    author_ids -= get_celebrity_ids(author_ids)
+    if not author_ids:
+        return
+    followers = defaultdict(list)
+    for author_id, user_id in Follow.objects.filter(
+        following__in=author_ids
+    ).values_list('following_id', 'user_id'):
+        followers[author_id].append(user_id)
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                   pub_date=post.pub_date)
+         for post in posts for user_id in followers[post.author_id]],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    bump_generation(*{
+        f'follow:{user_id}'
+        for user_ids in followers.values() for user_id in user_ids
+    })
+
+
+def follow_added(follow):
+    """
+    Обновляет ленту после подписки на автора.
+
+    Если у автора не больше FEED_FANOUT_LIMIT подписчиков, его посты
+    добавляются в ленту подписчика.
+    """
+    if follow.following_id in get_celebrity_ids((follow.following_id,)):
+        bump_generation(f'follow:{follow.user_id}')
+    else:
+        backfill((follow.user_id,), follow.following_id)
+
+
+def follow_removed(follow):
+    """
+    Обновляет ленту после отписки от автора.
+
+    Если автор опустился до порога FEED_FANOUT_LIMIT, его посты заново
+    раскладываются по лентам оставшихся подписчиков.
+    """
+    FeedEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.following_id
+    ).delete()
+    bump_generation(f'follow:{follow.user_id}')
+    dropped = AuthorStats.objects.filter(
+        user_id=follow.following_id,
+        followers_count=settings.FEED_FANOUT_LIMIT
+    )
+    if dropped.exists():
+        backfill(
+            list(Follow.objects.filter(following_id=follow.following_id)
+                 .values_list('user_id', flat=True)),
+            follow.following_id
+        )
+
+
+def get_followed_celebrities(user):
+    """
+    Возвращает id авторов без раскладки, на которых подписан пользователь.
+    """
+    return get_celebrity_ids(
+        Follow.objects.filter(user=user).values('following')
+    )
+
+
+def get_feed_scopes(user, celebrities):
+    """
+    Возвращает области кэша, от которых зависит лента пользователя.
+    """
+    return [f'follow:{user.pk}'] + [
+        f'profile:{author_id}' for author_id in sorted(celebrities)
+    ]
+
+
+def get_feed(user, celebrities=None):
+    """
+    Возвращает посты авторов, на которых подписан пользователь.
+
+    Основная часть читается из материализованной ленты, посты авторов
+    с большим числом подписчиков добавляются при чтении. Посты снабжены
+    полями feed_pub_date и feed_post, по которым лента упорядочивается
+    (FEED_ORDERING): без знаменитостей это ключ индекса ленты.
+    """
+    if celebrities is None:
+        celebrities = get_followed_celebrities(user)
+    if not celebrities:
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_pub_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post')
+        )
+    entries = FeedEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author__in=celebrities)
+    ).annotate(feed_pub_date=F('pub_date'), feed_post=F('pk'))
@@ -1,4 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+
+from core.uploadhandler import check_upload
+from .comments import validate_parent
 from .models import Post, Comment
 
 
@@ -13,14 +17,35 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean(self):
+        """
+        Заменяет общую ошибку поля image причиной отказа в загрузке.
+        """
+        cleaned_data = super().clean()
+        try:
+            check_upload(self.files.get('image'))
+        except ValidationError as error:
+            self.errors.pop('image', None)
+            self.add_error('image', error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     """
     Форма для создания комментариев.
 
-    Использует модель Comment и включает поле text.
+    Использует модель Comment и включает поле text. Ответ на комментарий
+    задается родителем в instance (instance.parent).
     """
 
     class Meta:
         model = Comment
         fields = ('text',)
+
+    def clean(self):
+        """
+        Проверяет, что на комментарий instance.parent можно ответить.
+        """
+        cleaned_data = super().clean()
+        validate_parent(self.instance.parent, self.instance.post_id)
+        return cleaned_data
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import CHUNK_SIZE, EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """
+    Команда для выгрузки постов, комментариев, подписок и тегов в
+    NDJSON или CSV.
+
+    Строки читаются из базы курсором пачками и сразу записываются, поэтому
+    память не зависит от объема выгрузки. Формат выгрузки совпадает с
+    форматом команды import_data.
+    """
+    help = 'Выгружает посты, комментарии, подписки или теги в NDJSON/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind',
+            choices=tuple(EXPORTS),
+            help='Тип выгружаемых записей'
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='ndjson',
+            help='Формат выгрузки'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки (по умолчанию - стандартный вывод)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Число строк, читаемых из базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            options['kind'], options['format'], options['chunk_size']
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        try:
+            file = open(options['output'], 'w', encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+        with file:
+            file.writelines(lines)
@@ -0,0 +1,164 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from posts.bulk import chunks, rebuild_derived, save_batch
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Команда для генерации тестовых данных.
+
+    Создает пользователей, группы, посты, комментарии и подписки пачками
+    через bulk_create (каждая пачка - в своей транзакции), затем
+    пересчитывает счетчики, полнотекстовый индекс и ленты подписок.
+    Популярность авторов распределена неравномерно, как в реальной сети.
+    """
+    help = 'Генерирует пользователей, группы, посты, комментарии и подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пачки bulk_create'
+        )
+        parser.add_argument(
+            '--password',
+            default='password',
+            help='Пароль созданных пользователей'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        user_ids = self.create_users(options['users'], options['password'])
+        group_ids = self.create_groups(options['groups'])
+        post_ids = self.create_posts(options['posts'], user_ids, group_ids)
+        self.create_comments(options['comments'], user_ids, post_ids)
+        self.create_follows(options['follows'], user_ids)
+        self.stdout.write('Пересчет счетчиков, индекса и лент...')
+        rebuild_derived()
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
+
+    def bulk_create(self, model, objects):
+        """
+        Сохраняет объекты пачками и возвращает диапазон их id.
+
+        Каждая пачка сохраняется в отдельной транзакции, поэтому память
+        и длина транзакций не зависят от общего числа объектов.
+        """
+        first = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        count = sum(
+            save_batch(model, batch, ignore_conflicts=True)
+            for batch in chunks(objects, self.batch_size)
+        )
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {count}')
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return range(first, last + 1)
+
+    def popular(self, ids):
+        """
+        Возвращает случайный id, чаще - из начала диапазона (закон Ципфа).
+        """
+        index = int(self.random.paretovariate(1.2)) - 1
+        return ids[index % len(ids)]
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        start = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        return self.bulk_create(User, (
+            User(
+                username=f'{self.fake.user_name()}_{start + i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for i in range(count)
+        ))
+
+    def create_groups(self, count):
+        start = Group.objects.count()
+        mixer = Mixer(commit=False, locale='ru')
+        return self.bulk_create(Group, mixer.cycle(count).blend(
+            Group, slug=mixer.sequence(lambda i: f'group-{start + i}')
+        ))
+
+    def create_posts(self, count, user_ids, group_ids):
+        return self.bulk_create(Post, (
+            Post(
+                author_id=self.popular(user_ids),
+                group_id=(self.random.choice(group_ids)
+                          if group_ids and self.random.random() < 0.5
+                          else None),
+                text=self.fake.paragraph(nb_sentences=3),
+            )
+            for _ in range(count)
+        ))
+
+    def create_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        self.bulk_create(Comment, (
+            Comment(
+                post_id=self.popular(post_ids),
+                author_id=self.random.choice(user_ids),
+                text=self.fake.sentence(),
+            )
+            for _ in range(count)
+        ))
+
+    def create_follows(self, count, user_ids):
+        """
+        Создает count подписок без повторов (не больше n·(n−1) для n
+        пользователей).
+
+        Авторы выбираются по популярности, но попыток не больше трех
+        на подписку: остаток добирается равномерно из еще не выбранных пар,
+        поэтому время не зависит от того, насколько count близко к n·(n−1).
+        """
+        size = len(user_ids)
+        count = min(count, size * (size - 1))
+        pairs = set()
+        for _ in range(3 * count):
+            if len(pairs) == count:
+                break
+            user_id = self.random.choice(user_ids)
+            following_id = self.popular(user_ids)
+            if user_id != following_id:
+                pairs.add((user_id, following_id))
+        if len(pairs) < count:
+            # Номер пары i - подписчик i // (n - 1) на одного из остальных
+            # n - 1 пользователей; range выбирается без построения списка.
+            extra = count - len(pairs)
+            for index in self.random.sample(
+                range(size * (size - 1)), extra + len(pairs)
+            ):
+                follower, other = divmod(index, size - 1)
+                following = other + 1 if other >= follower else other
+                pair = (user_ids[follower], user_ids[following])
+                if pair not in pairs:
+                    pairs.add(pair)
+                    extra -= 1
+                    if not extra:
+                        break
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, following_id=following_id)
+            for user_id, following_id in pairs
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+class Command(BaseCommand):
+    """
+    Команда для подготовки миниатюр картинок постов.
+
+    Нужна для постов, загруженных до появления фоновой подготовки
+    миниатюр или в обход сигналов.
+    """
+    help = 'Готовит миниатюры и варианты картинок постов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Подготовить миниатюры заново для всех постов с картинками'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(Q(thumbnails={}) | Q(image_variants={}))
+        count = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            generate(post_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлено миниатюр для постов: {count}'
+        ))
@@ -0,0 +1,333 @@
+import csv
+import json
+import sys
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import (bulk_insert_dated, chunks, rebuild_derived,
+                        reset_sequences, save_batch)
+from posts.models import Comment, Follow, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+# Сколько пропущенных записей выводить подробно.
+MAX_WARNINGS = 10
+
+
+class SkipRecord(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Команда для загрузки постов, комментариев, подписок и тегов из
+    файлов JSONL или CSV.
+
+    Записи читаются потоком и сохраняются пачками через bulk_create,
+    каждая пачка - в своей транзакции, поэтому память не зависит от
+    размера файла. Ссылки на пользователей (username), группы (slug),
+    посты (id) и теги (name) разрешаются одним запросом на пачку.
+    Записи с ошибками и ссылками на несуществующие объекты пропускаются.
+    После загрузки пересчитываются счетчики, полнотекстовый индекс и
+    ленты подписок.
+
+    Поля записей:
+    posts - text, author, [id, group, pub_date, tags];
+    comments - post, author, text, [id, parent, created];
+    follows - user, following;
+    tags - post, tag.
+    В CSV теги поста перечисляются через запятую.
+    """
+    help = 'Загружает посты, комментарии, подписки или теги из JSONL/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind',
+            choices=('posts', 'comments', 'follows', 'tags'),
+            help='Тип загружаемых записей'
+        )
+        parser.add_argument('path', help='Путь к файлу или - для stdin')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат файла (по умолчанию - по расширению)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пачки bulk_create'
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересчитывать производные данные после загрузки'
+        )
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        file_format = options['format'] or (
+            'csv' if Path(path).suffix.lower() == '.csv' else 'jsonl'
+        )
+        self.skipped = 0
+        load = getattr(self, f'load_{kind}')
+        if path == '-':
+            loaded = self.load(load, sys.stdin, file_format, options)
+        else:
+            try:
+                file = open(path, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(f'Не удалось открыть файл: {error}')
+            with file:
+                loaded = self.load(load, file, file_format, options)
+        self.stdout.write(f'Загружено: {loaded}, пропущено: {self.skipped}')
+        if not options['no_rebuild']:
+            self.stdout.write('Пересчет производных данных...')
+            rebuild_derived(
+                counters=kind in ('posts', 'comments', 'tags'),
+                search_index=kind == 'posts',
+                feeds=kind in ('posts', 'follows'),
+            )
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
+
+    def load(self, load, file, file_format, options):
+        records = self.read_csv(file) if file_format == 'csv' else (
+            self.read_jsonl(file)
+        )
+        loaded = 0
+        for batch in chunks(records, options['batch_size']):
+            loaded += load(batch)
+        if options['kind'] in ('posts', 'comments'):
+            reset_sequences(Post, Comment)
+        return loaded
+
+    def read_jsonl(self, file):
+        """
+        Возвращает пары (номер строки, запись) из файла JSONL.
+        """
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                self.skip(line_number, f'некорректный JSON: {error}')
+                continue
+            if not isinstance(record, dict):
+                self.skip(line_number, 'запись не является объектом')
+                continue
+            yield line_number, record
+
+    def read_csv(self, file):
+        """
+        Возвращает пары (номер строки, запись) из файла CSV с заголовком.
+        Пустые значения считаются отсутствующими.
+        """
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, {
+                key: value for key, value in record.items() if value
+            }
+
+    def skip(self, line_number, reason):
+        self.skipped += 1
+        if self.skipped <= MAX_WARNINGS:
+            self.stderr.write(f'Строка {line_number} пропущена: {reason}')
+
+    def validate(self, batch, check):
+        """
+        Вызывает check для каждой записи пачки и возвращает результаты
+        для записей без ошибок.
+        """
+        objects = []
+        for line_number, record in batch:
+            try:
+                objects.append(check(record))
+            except SkipRecord as error:
+                self.skip(line_number, error)
+            except (KeyError, TypeError, ValueError) as error:
+                self.skip(line_number, f'некорректное поле {error}')
+        return objects
+
+    def lookup(self, model, field, batch, *keys):
+        """
+        Возвращает {значение: id} для объектов model, на которые
+        ссылаются поля keys записей пачки. Значения приводятся к строкам.
+        """
+        values = {
+            str(record[key]) for _, record in batch for key in keys
+            if record.get(key) is not None
+        }
+        if field == 'pk':
+            values = {int(value) for value in values if value.isdigit()}
+        return {
+            str(value): pk for value, pk in
+            model.objects.filter(**{f'{field}__in': values})
+            .values_list(field, 'pk')
+        }
+
+    def get_date(self, record, key):
+        value = record.get(key)
+        if value is None:
+            return timezone.now()
+        date = parse_datetime(value)
+        if date is None:
+            raise SkipRecord(f'некорректная дата {value!r}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def taken_ids(self, model, batch):
+        """
+        Возвращает множество id записей пачки, уже занятых в таблице model.
+        """
+        return set(self.lookup(model, 'pk', batch, 'id').values())
+
+    def check_id(self, taken, obj):
+        """
+        Пропускает запись с занятым id (в таблице или выше в файле)
+        и отмечает id принятой записи как занятый.
+        """
+        if obj.pk is None:
+            return
+        if obj.pk in taken:
+            raise SkipRecord(f'id {obj.pk} уже занят')
+        taken.add(obj.pk)
+
+    def get_ref(self, found, record, key, label):
+        value = str(record[key])
+        if value not in found:
+            raise SkipRecord(f'{label} {value!r} не найден')
+        return found[value]
+
+    def load_posts(self, batch):
+        users = self.lookup(User, 'username', batch, 'author')
+        groups = self.lookup(Group, 'slug', batch, 'group')
+        taken = self.taken_ids(Post, batch)
+
+        def check(record):
+            tags = record.get('tags') or []
+            if isinstance(tags, str):
+                tags = [tag.strip() for tag in tags.split(',')]
+            post = Post(
+                pk=int(record['id']) if 'id' in record else None,
+                text=record['text'],
+                author_id=self.get_ref(users, record, 'author',
+                                       'пользователь'),
+                group_id=(self.get_ref(groups, record, 'group', 'группа')
+                          if record.get('group') else None),
+                pub_date=self.get_date(record, 'pub_date'),
+            )
+            self.check_id(taken, post)
+            return post, [tag for tag in tags if tag]
+
+        rows = self.validate(batch, check)
+        posts = [post for post, _ in rows]
+        with transaction.atomic():
+            # id нужны для связей с тегами, поэтому назначаются заранее.
+            self.assign_ids(Post, posts)
+            bulk_insert_dated(Post, posts, 'pub_date')
+            names = {name for _, tags in rows for name in tags}
+            if names:
+                tags = Tag.get_ids(names)
+                TagPost.objects.bulk_create(
+                    (TagPost(post_id=post.pk, tag_id=tags[name])
+                     for post, post_tags in rows for name in set(post_tags)),
+                    ignore_conflicts=True
+                )
+        return len(posts)
+
+    def assign_ids(self, model, objects):
+        """
+        Назначает id объектам без id, если база не возвращает id
+        вставленных строк.
+        """
+        if connection.features.can_return_rows_from_bulk_insert:
+            return
+        last = max(
+            [model.objects.aggregate(last=Max('pk'))['last'] or 0]
+            + [obj.pk for obj in objects if obj.pk]
+        )
+        for obj in objects:
+            if obj.pk is None:
+                last += 1
+                obj.pk = last
+
+    def load_comments(self, batch):
+        users = self.lookup(User, 'username', batch, 'author')
+        posts = self.lookup(Post, 'pk', batch, 'post')
+        taken = self.taken_ids(Comment, batch)
+        # Родитель ответа - комментарий из базы или из этой же пачки выше;
+        # для проверки хранится id его поста. Пути и глубина ответов
+        # задаются после загрузки (fill_paths).
+        ids = {
+            int(record['parent']) for _, record in batch
+            if str(record.get('parent')).isdigit()
+        }
+        parents = {
+            str(pk): post_id for pk, post_id in
+            Comment.objects.filter(pk__in=ids).values_list('pk', 'post_id')
+        }
+
+        def check(record):
+            comment = Comment(
+                pk=int(record['id']) if 'id' in record else None,
+                post_id=self.get_ref(posts, record, 'post', 'пост'),
+                author_id=self.get_ref(users, record, 'author',
+                                       'пользователь'),
+                text=record['text'],
+                created=self.get_date(record, 'created'),
+            )
+            if record.get('parent') is not None:
+                parent = str(record['parent'])
+                if parents.get(parent) != comment.post_id:
+                    raise SkipRecord(
+                        f'комментарий {parent!r} не найден у поста'
+                    )
+                comment.parent_id = int(parent)
+            self.check_id(taken, comment)
+            if comment.pk is not None:
+                parents[str(comment.pk)] = comment.post_id
+            return comment
+
+        comments = self.validate(batch, check)
+        with transaction.atomic():
+            self.assign_ids(Comment, comments)
+            bulk_insert_dated(Comment, comments, 'created')
+        return len(comments)
+
+    def load_follows(self, batch):
+        users = self.lookup(User, 'username', batch, 'user', 'following')
+
+        def check(record):
+            follow = Follow(
+                user_id=self.get_ref(users, record, 'user', 'пользователь'),
+                following_id=self.get_ref(users, record, 'following',
+                                          'пользователь'),
+            )
+            if follow.user_id == follow.following_id:
+                raise SkipRecord('подписка на самого себя')
+            return follow
+
+        return save_batch(Follow, self.validate(batch, check),
+                          ignore_conflicts=True)
+
+    def load_tags(self, batch):
+        posts = self.lookup(Post, 'pk', batch, 'post')
+        rows = self.validate(batch, lambda record: (
+            self.get_ref(posts, record, 'post', 'пост'), str(record['tag'])
+        ))
+        with transaction.atomic():
+            tags = Tag.get_ids({name for _, name in rows})
+            TagPost.objects.bulk_create(
+                (TagPost(post_id=post_id, tag_id=tags[name])
+                 for post_id, name in rows),
+                ignore_conflicts=True
+            )
+        return len(rows)
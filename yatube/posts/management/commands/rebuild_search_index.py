@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+from posts.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Команда для построения полнотекстового индекса постов.
+
+    Нужна после миграции, создающей пустой индекс, после загрузки постов
+    в обход сигналов и после изменения нормализации текста в posts.search.
+    """
+    help = 'Заново строит полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Полнотекстовый индекс недоступен')
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {Post.objects.count()}'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета счетчиков постов и комментариев.
+
+    Исправляет расхождения денормализованных счетчиков с фактическими
+    данными, например после загрузки данных в обход сигналов.
+    """
+    help = ('Пересчитывает счетчики постов авторов и тегов и комментариев '
+            'к постам')
+
+    def handle(self, *args, **options):
+        posts_fixed, authors_fixed, tags_fixed = reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: постов - {posts_fixed}, '
+            f'авторов - {authors_fixed}, тегов - {tags_fixed}'
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:18
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    Tag = apps.get_model('posts', 'Tag')
+    TagPost = apps.get_model('posts', 'TagPost')
+    duplicates = (Tag.objects.order_by().values('name')
+                  .annotate(first=Min('pk'), count=Count('pk'))
+                  .filter(count__gt=1).values_list('name', 'first'))
+    for name, first in duplicates:
+        others = Tag.objects.filter(name=name).exclude(pk=first)
+        TagPost.objects.filter(tag__in=others).update(tag_id=first)
+        others.delete()
+    keep = (TagPost.objects.order_by().values('post', 'tag')
+            .annotate(first=Min('pk')).values_list('first', flat=True))
+    TagPost.objects.exclude(pk__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='tagpost',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_tag_post'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_tag_counts(apps, schema_editor):
+    Tag = apps.get_model('posts', 'Tag')
+    TagPost = apps.get_model('posts', 'TagPost')
+    posts = (TagPost.objects.filter(tag=OuterRef('pk'))
+             .order_by().values('tag')
+             .annotate(count=Count('pk')).values('count'))
+    Tag.objects.update(posts_count=Coalesce(Subquery(posts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_tag_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество постов'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-posts_count', 'name'], name='tag_posts_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagpost',
+            index=models.Index(fields=['tag', '-post'], name='tagpost_tag_post_idx'),
+        ),
+        migrations.RunPython(fill_tag_counts, migrations.RunPython.noop),
+    ]
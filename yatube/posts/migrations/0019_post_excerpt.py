@@ -0,0 +1,32 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:37
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = []
+    for post in Post.objects.only('text').iterator(chunk_size=2000):
+        post.excerpt = Truncator(post.text).chars(300)
+        posts.append(post)
+        if len(posts) == 2000:
+            Post.objects.bulk_update(posts, ('excerpt',))
+            posts = []
+    Post.objects.bulk_update(posts, ('excerpt',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_comment_thread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Отрывок'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.23 on 2026-10-18 17:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_counts(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    followers = (Follow.objects.filter(following=OuterRef('user'))
+                 .order_by().values('following')
+                 .annotate(count=Count('pk')).values('count'))
+    AuthorStats.objects.update(
+        followers_count=Coalesce(Subquery(followers), 0)
+    )
+    missing = dict(
+        Follow.objects.exclude(following__stats__isnull=False)
+        .order_by().values_list('following').annotate(count=Count('pk'))
+    )
+    posts = dict(
+        Post.objects.filter(author__in=missing)
+        .order_by().values_list('author').annotate(count=Count('pk'))
+    )
+    AuthorStats.objects.bulk_create(
+        AuthorStats(user_id=user_id, followers_count=count,
+                    posts_count=posts.get(user_id, 0))
+        for user_id, count in missing.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.23 on 2026-10-18 18:20
+
+from django.db import migrations
+
+
+def reset_image_variants(apps, schema_editor):
+    # Варианты теперь хранятся по размерам миниатюр и готовятся заново
+    # командой generate_thumbnails.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image_variants={}).update(image_variants={})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_authorstats_followers_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_image_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.23 on 2026-10-18 19:10
+
+from django.db import migrations, models
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+
+def repad_paths(width):
+    def repad(apps, schema_editor):
+        # Пути строятся заново по уровням, как в posts.comments.fill_paths.
+        Comment = apps.get_model('posts', 'Comment')
+        segment = LPad(Cast('pk', CharField()), width, Value('0'))
+        Comment.objects.update(path='')
+        Comment.objects.filter(parent=None).update(path=segment)
+        parent = Comment.objects.filter(pk=OuterRef('parent_id'))
+        while Comment.objects.filter(path='', parent__path__gt='').update(
+            path=Concat(Subquery(parent.values('path')[:1]), segment,
+                        output_field=CharField())
+        ):
+            pass
+    return repad
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_reset_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=1000, verbose_name='Путь в ветке'),
+        ),
+        migrations.RunPython(repad_paths(20), repad_paths(10)),
+    ]
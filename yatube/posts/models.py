@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils.text import Truncator
 from django.contrib.auth import get_user_model
 
 
@@ -10,13 +11,48 @@ class Tag(models.Model):
     """
     Модель для тегов.
 
-    Содержит поле name для хранения названия тега.
+    Содержит поле name для хранения уникального названия тега и счетчик
+    posts_count с количеством постов с тегом.
     """
-    name = models.CharField(max_length=64)
+    name = models.CharField(max_length=64, unique=True)
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('-posts_count', 'name'),
+                name='tag_posts_count_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def get_ids(cls, names):
+        """
+        Возвращает {название: id} тегов names, создавая недостающие.
+
+        Существующие теги читаются одним запросом, недостающие создаются
+        одним bulk_create; теги, созданные параллельно, пропускаются
+        благодаря уникальности названия.
+        """
+        names = set(names)
+        ids = dict(cls.objects.filter(name__in=names)
+                   .values_list('name', 'pk'))
+        missing = names - set(ids)
+        if missing:
+            cls.objects.bulk_create(
+                [cls(name=name) for name in missing], ignore_conflicts=True
+            )
+            ids.update(cls.objects.filter(name__in=missing)
+                       .values_list('name', 'pk'))
+        return ids
+
 
 class Group(models.Model):
     """
@@ -38,16 +74,72 @@ class Group(models.Model):
         return reverse('posts:group_list', args=[self.slug])
 
 
+class PostQuerySet(models.QuerySet):
+    """
+    Набор постов с готовыми профилями загрузки связанных объектов.
+
+    Пакетные bulk_create, bulk_update и update с новым текстом заполняют
+    отрывок excerpt, как и сохранение поста.
+    """
+
+    def for_cards(self):
+        """
+        Возвращает посты для карточек (post_card.html) и списков API:
+        автор и группа загружаются тем же запросом, а вместо полного
+        текста читается только отрывок excerpt.
+        """
+        return self.select_related('author', 'group').defer('text')
+
+    def with_tags(self):
+        """
+        Возвращает посты с полным текстом, автором, группой и тегами
+        (теги - одним запросом на все посты).
+        """
+        return self.select_related('author', 'group').prefetch_related('tags')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for post in objs:
+            post.excerpt = post.make_excerpt(post.text)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'text' in fields and 'excerpt' not in fields:
+            objs = list(objs)
+            for post in objs:
+                post.excerpt = post.make_excerpt(post.text)
+            fields = (*fields, 'excerpt')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        text = kwargs.get('text')
+        if isinstance(text, str) and 'excerpt' not in kwargs:
+            kwargs['excerpt'] = self.model.make_excerpt(text)
+        return super().update(**kwargs)
+
+
 class Post(models.Model):
     """
     Модель для постов.
 
-    Содержит поля text, pub_date, author, group, image и tags.
+    Содержит поля text, pub_date, author, group, image и tags. Поля
+    thumbnails и image_variants хранят адреса миниатюр и вариантов
+    картинки для srcset, которые готовятся в фоне после загрузки
+    (см. posts.thumbnails). Поле excerpt хранит начало текста длиной до
+    EXCERPT_LENGTH символов для карточек и обновляется вместе с текстом.
     """
+    EXCERPT_LENGTH = 300
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
+    excerpt = models.CharField(
+        'Отрывок',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
@@ -73,22 +165,157 @@ class Post(models.Model):
         blank=True
     )
     tags = models.ManyToManyField(Tag, through='TagPost')
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    thumbnails = models.JSONField(
+        'Миниатюры',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        'Варианты картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
+    derived_fields = ('comments_count', 'thumbnails', 'image_variants')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
-        return self.text[:15]
+        text = self.excerpt
+        if not text and 'text' in self.__dict__:
+            text = self.text
+        return text[:15]
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет пост вместе с обновлением счетчиков в одной транзакции.
+
+        Отрывок обновляется вместе с текстом, если текст загружен (не
+        отложен, как в for_cards).
+        """
+        if 'text' not in self.get_deferred_fields():
+            self.excerpt = self.make_excerpt(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        """
+        Обновляет строку поста, не перезаписывая счетчики и миниатюры
+        (derived_fields), которые меняются запросами UPDATE в обход
+        экземпляра.
+
+        Поля исключаются только из UPDATE: если строки нет (копия поста
+        или удаленный пост), save вставляет ее со всеми полями.
+        """
+        if update_fields is None:
+            values = [value for value in values
+                      if value[0].name not in self.derived_fields]
+        return super()._do_update(base_qs, using, pk_val, values,
+                                  update_fields, forced_update)
+
+    @classmethod
+    def make_excerpt(cls, text):
+        """
+        Возвращает отрывок текста text для карточек.
+        """
+        return Truncator(text).chars(cls.EXCERPT_LENGTH)
+
+    def cache_scopes(self):
+        """
+        Возвращает области кэша страниц, на которых показывается пост.
+        """
+        scopes = ['index', f'profile:{self.author_id}', f'post:{self.pk}']
+        if self.group_id:
+            scopes.append(f'group:{self.group_id}')
+        return scopes
+
+
+class SearchTextField(models.TextField):
+    """
+    Текстовое поле полнотекстового индекса с поиском через MATCH.
+    """
+
+
+@SearchTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearchIndex(models.Model):
+    """
+    Модель полнотекстового индекса постов.
+
+    Отображается на виртуальную таблицу FTS5, которая создается миграцией
+    и заполняется сигналами сохранения и удаления постов. Поле text хранит
+    основы слов поста, rank - релевантность найденного поста.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    text = SearchTextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
 
 
 class Comment(models.Model):
     """
     Модель для комментариев к постам.
 
-    Содержит поля post, author, text и created.
+    Содержит поля post, author, text, created и parent (комментарий, на
+    который дан ответ). Ветки хранятся материализованным путем path: путь
+    ответа - путь родителя и id ответа, дополненный нулями до PATH_WIDTH
+    цифр. Поэтому ветка или поддерево читаются одним запросом по диапазону
+    путей в порядке веток, а depth - глубина комментария в ветке.
+
+    PATH_WIDTH вмещает любой id (bigint - до 19 цифр): более длинный id
+    нарушил бы порядок путей. Длины пути хватает на PATH_MAX_DEPTH
+    уровней ответов.
     """
+    PATH_WIDTH = 20
+    PATH_MAX_DEPTH = 49
+
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -101,16 +328,77 @@ class Comment(models.Model):
         related_name='comments',
         verbose_name='Автор'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
     text = models.TextField()
     created = models.DateTimeField(
         'Дата комментария',
         auto_now_add=True
     )
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=PATH_WIDTH * (PATH_MAX_DEPTH + 1),
+        default='',
+        editable=False
+    )
+    depth = models.PositiveSmallIntegerField(
+        'Глубина в ветке',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx'
+            ),
+            models.Index(
+                fields=('post', 'depth', '-created', '-id'),
+                name='comment_post_depth_idx'
+            ),
+            models.Index(
+                fields=('post', 'path'),
+                name='comment_post_path_idx'
+            ),
+        )
+
+    def get_depth(self):
+        """
+        Возвращает глубину комментария по родителю.
+        """
+        return self.parent.depth + 1 if self.parent_id else 0
+
+    def get_path(self):
+        """
+        Возвращает путь комментария по пути родителя и id.
+        """
+        segment = str(self.pk).zfill(self.PATH_WIDTH)
+        return self.parent.path + segment if self.parent_id else segment
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет комментарий вместе со счетчиком поста в одной транзакции.
+
+        Путь нового комментария содержит его id, поэтому записывается
+        отдельным запросом после вставки.
+        """
+        with transaction.atomic():
+            if self._state.adding:
+                self.depth = self.get_depth()
+            super().save(*args, **kwargs)
+            if not self.path:
+                self.path = self.get_path()
+                Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 
 class Follow(models.Model):
@@ -130,10 +418,89 @@ class Follow(models.Model):
         related_name='following',
     )
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'following'),
+                name='unique_follow'
+            ),
+        )
+
     def __str__(self):
         return (f'{self.user}: {self.following}')
 
 
+class AuthorStats(models.Model):
+    """
+    Модель для счетчиков автора.
+
+    Содержит поля posts_count с количеством постов пользователя
+    и followers_count с количеством его подписчиков. Счетчики обновляются
+    при создании и удалении постов и подписок.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class FeedEntry(models.Model):
+    """
+    Модель для материализованной ленты подписок.
+
+    Содержит поля user, post, author и pub_date. Записи создаются при
+    публикации поста (fan-out on write) и при подписке на автора, а
+    удаляются при отписке и удалении поста.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_user_pub_date_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.post}'
+
+
 class TagPost(models.Model):
     """
     Промежуточная модель для связи тегов и постов.
@@ -143,6 +510,20 @@ class TagPost(models.Model):
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'tag'),
+                name='unique_tag_post'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('tag', '-post'),
+                name='tagpost_tag_post_idx'
+            ),
+        )
+
     def __str__(self):
         return f'{self.tag}: {self.post}'
 
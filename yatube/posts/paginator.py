@@ -0,0 +1,333 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+
+from core.cache import CacheNamespace
+
+counts_cache = CacheNamespace('counts')
+
+# Ссылки на страницы: соседние с текущей и крайние, остальные - многоточие.
+PAGE_LINKS_ON_EACH_SIDE = 2
+PAGE_LINKS_ON_ENDS = 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class LazyRows:
+    """
+    Записи страницы, которые читаются функцией load при первом обращении.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.rows = None
+
+    def get_rows(self):
+        if self.rows is None:
+            self.rows = self.load()
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.get_rows())
+
+    def __len__(self):
+        return len(self.get_rows())
+
+    def __getitem__(self, index):
+        return self.get_rows()[index]
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинатор по ключу (keyset pagination).
+
+    Записи упорядочиваются по ordering (по умолчанию (-pub_date, -pk)).
+    Переход на соседнюю страницу выполняется по курсору, который хранит ключ
+    крайней записи текущей страницы, поэтому страница N читается так же
+    быстро, как первая. Номерные страницы без курсора читаются через OFFSET.
+
+    Общее количество записей передается готовым (count), берется из кэша
+    (count_cache_key) или не считается вовсе (exact_count=False) - тогда
+    оно оценивается по текущей странице. На последней странице количество
+    всегда уточняется.
+
+    Номерные страницы из второй половины при точном количестве (посчитанном
+    запросом COUNT, а не переданном или взятом из кэша) читаются с конца
+    в обратном порядке, поэтому последняя страница читается так же быстро,
+    как первая. Страница содержит ссылки page_links на соседние и
+    крайние страницы (пропуски - Paginator.ELLIPSIS), а count_is_exact
+    показывает, известно ли количество (и последняя страница) точно.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 count_cache_key=None, exact_count=True, count=None,
+                 **kwargs):
+        self.ordering = ordering
+        self.known_count = count
+        self.count_cache_key = count_cache_key
+        self.exact_count = exact_count
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+
+    def validate_number(self, number):
+        """
+        Проверяет номер страницы, не обращаясь к общему количеству записей.
+        """
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def get_page(self, number, cursor=None):
+        """
+        Возвращает страницу по курсору, а если его нет - по номеру.
+
+        Некорректный курсор или номер приводят к первой странице,
+        слишком большой номер - к последней.
+        """
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        try:
+            number = self.validate_number(number)
+        except (PageNotAnInteger, EmptyPage):
+            number = 1
+        try:
+            return self.page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def get_lazy_page(self, number, cursor=None, prepare=None):
+        """
+        Возвращает страницу, записи которой читаются через get_page при
+        первом обращении к ним (len, перебор).
+
+        До чтения номер страницы берется из number, после чтения номер,
+        курсоры и ссылки совпадают со страницей get_page. Функция prepare
+        вызывается с прочитанной страницей.
+        """
+        try:
+            guess = self.validate_number(number)
+        except (PageNotAnInteger, EmptyPage):
+            guess = 1
+        page = Page(None, guess, self)
+
+        def load():
+            loaded = self.get_page(number, cursor)
+            if prepare is not None:
+                prepare(loaded)
+            page.__dict__.update(loaded.__dict__)
+            return page.object_list
+
+        page.object_list = LazyRows(load)
+        return page
+
+    def page(self, number):
+        """
+        Возвращает страницу по номеру.
+        """
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        # Отставшее количество сдвинуло бы страницы, прочитанные с конца,
+        # относительно страниц, прочитанных с начала.
+        count = self._known_count(counted=True) if number > 1 else None
+        if count is not None and count - bottom < bottom:
+            rows = self._rows_from_end(bottom, count)
+        else:
+            rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет записей')
+        return self._build_page(rows, number)
+
+    def _rows_from_end(self, bottom, count):
+        """
+        Читает записи страницы с началом bottom в обратном порядке от конца
+        (OFFSET отсчитывается от последней записи) и следующую за ними.
+        """
+        if bottom >= count:
+            return []
+        top = min(bottom + self.per_page + 1, count)
+        ordering = [self._flip(field) for field in self.ordering]
+        rows = list(
+            self.object_list.order_by(*ordering)[count - top:count - bottom]
+        )
+        rows.reverse()
+        return rows
+
+    def cursor_page(self, cursor):
+        """
+        Возвращает страницу, соседнюю с записью, закодированной в курсоре.
+        """
+        number, reverse, values = self.decode_cursor(cursor)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._flip(field) for field in ordering]
+        try:
+            rows = list(
+                self.object_list
+                .filter(self._keyset_filter(values, reverse))
+                .order_by(*ordering)[:self.per_page + 1]
+            )
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor
+        return self._build_page(rows, number, reverse)
+
+    def encode_cursor(self, number, row, reverse=False):
+        """
+        Кодирует номер страницы и ключ записи row в курсор.
+        """
+        values = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        data = json.dumps([number, reverse, values], default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Декодирует курсор в номер страницы, направление и ключ записи.
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            number, reverse, values = json.loads(data)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor
+        if (not isinstance(number, int) or number < 1
+                or len(values) != len(self.ordering)):
+            raise InvalidCursor
+        return number, bool(reverse), values
+
+    def _keyset_filter(self, values, reverse):
+        """
+        Возвращает условие на записи после ключа values в порядке ordering
+        (до него, если reverse).
+
+        Условие на первое поле ограничивает диапазон отдельно от цепочки
+        OR, чтобы база искала начало страницы по индексу, а не
+        просматривала его с начала.
+        """
+        query = Q()
+        fields = [field.lstrip('-') for field in self.ordering]
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition = Q(**{f'{fields[index]}__{lookup}': values[index]})
+            for previous in range(index):
+                condition &= Q(**{fields[previous]: values[previous]})
+            query |= condition
+        descending = self.ordering[0].startswith('-')
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{fields[0]}__{lookup}': values[0]}) & query
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _build_page(self, rows, number, reverse=False):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            if not has_more:
+                number = 1
+            has_next = True
+        else:
+            has_next = has_more
+        self._update_count(number, len(rows), has_next)
+        page = Page(rows, number, self)
+        page.page_links = list(self.get_elided_page_range(
+            number,
+            on_each_side=PAGE_LINKS_ON_EACH_SIDE,
+            on_ends=PAGE_LINKS_ON_ENDS
+        ))
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and page.has_next():
+            page.next_cursor = self.encode_cursor(number + 1, rows[-1])
+        if rows and page.has_previous():
+            page.previous_cursor = self.encode_cursor(
+                number - 1, rows[0], reverse=True
+            )
+        return page
+
+    def _update_count(self, number, length, has_next):
+        bottom = (number - 1) * self.per_page
+        self.count_is_exact = True
+        if not has_next:
+            count = bottom + length
+            if self.count_cache_key is not None:
+                counts_cache.set(self.count_cache_key, count)
+        else:
+            count = self._known_count()
+            if count is None or count <= bottom + length:
+                count = bottom + length + 1
+                self.count_is_exact = False
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+
+    def _known_count(self, counted=False):
+        """
+        Возвращает известное количество записей или None.
+
+        При counted возвращается только количество, посчитанное запросом
+        COUNT: переданное count и количество из кэша могут отставать.
+        """
+        if not self.exact_count:
+            return None
+        if self.known_count is not None:
+            return None if counted else self.known_count
+        if self.count_cache_key is None:
+            return super().count
+        count = counts_cache.get(self.count_cache_key)
+        if count is None:
+            count = super().count
+            counts_cache.set(self.count_cache_key, count)
+        elif counted:
+            return None
+        return count
+
+
+def get_page(request, object_list, per_page=None, **kwargs):
+    """
+    Возвращает страницу object_list по параметрам запроса page и cursor.
+
+    По умолчанию на странице POSTS_PER_PAGE записей.
+    """
+    paginator = KeysetPaginator(
+        object_list, per_page or settings.POSTS_PER_PAGE, **kwargs
+    )
+    return paginator.get_page(
+        request.GET.get('page'),
+        request.GET.get('cursor')
+    )
+
+
+def get_lazy_page(request, object_list, per_page=None, prepare=None,
+                  **kwargs):
+    """
+    Возвращает страницу, как get_page, но читает ее записи при первом
+    обращении.
+
+    Если список на странице взят из кэша фрагмента (fragment_cache),
+    записи не нужны шаблону, и запросы за ними не выполняются. Функция
+    prepare вызывается с прочитанной страницей, например чтобы дополнить
+    ее миниатюрами.
+    """
+    paginator = KeysetPaginator(
+        object_list, per_page or settings.POSTS_PER_PAGE, **kwargs
+    )
+    return paginator.get_lazy_page(
+        request.GET.get('page'),
+        request.GET.get('cursor'),
+        prepare
+    )
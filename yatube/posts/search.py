@@ -0,0 +1,227 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Value
+
+from .models import Post
+
+WORD_RE = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """
+    Возвращает начала областей RV и R2 слова.
+    """
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(word, endings, start=0, after_a=False):
+    """
+    Отрезает самое длинное окончание из endings, лежащее после start.
+
+    При after_a=True окончание должно следовать за 'а' или 'я'.
+    """
+    for ending in sorted(endings, key=len, reverse=True):
+        if not word.endswith(ending) or len(word) - len(ending) < start:
+            continue
+        stem = word[:-len(ending)]
+        if after_a and not (len(stem) > start and stem[-1] in 'ая'):
+            continue
+        return stem
+    return None
+
+
+def _strip_group(word, groups, start):
+    first, second = groups
+    candidates = [
+        stem for stem in (
+            _strip(word, first, start, after_a=True),
+            _strip(word, second, start),
+        ) if stem is not None
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=len)
+
+
+def stem(word):
+    """
+    Возвращает основу русского слова (упрощенный стеммер Snowball).
+
+    Слова не на кириллице возвращаются без изменений.
+    """
+    word = word.lower().replace('ё', 'е')
+    if not re.fullmatch('[а-я]+', word):
+        return word
+    rv, r2 = _regions(word)
+    stemmed = _strip_group(word, PERFECTIVE_GERUND, rv)
+    if stemmed is None:
+        word = _strip(word, REFLEXIVE, rv) or word
+        stemmed = _strip(word, ADJECTIVE, rv)
+        if stemmed is not None:
+            stemmed = _strip_group(stemmed, PARTICIPLE, rv) or stemmed
+        else:
+            stemmed = _strip_group(word, VERB, rv)
+            if stemmed is None:
+                stemmed = _strip(word, NOUN, rv)
+    word = stemmed if stemmed is not None else word
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, DERIVATIONAL, r2) or word
+    if word.endswith('нн'):
+        return word[:-1]
+    superlative = _strip(word, SUPERLATIVE, rv)
+    if superlative is not None:
+        word = superlative
+        return word[:-1] if word.endswith('нн') else word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def normalize(text):
+    """
+    Разбивает текст на слова и приводит их к основам.
+    """
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def build_query(keyword):
+    """
+    Составляет запрос FTS5: все основы слова keyword с поиском по префиксу.
+    """
+    return ' '.join(
+        '"{}"*'.format(term.replace('"', '""'))
+        for term in normalize(keyword).split()
+    )
+
+
+def is_available():
+    """
+    Проверяет, поддерживает ли база данных полнотекстовый индекс.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    """
+    Добавляет или обновляет пост в полнотекстовом индексе.
+    """
+    index_posts((post,))
+
+
+def index_posts(posts):
+    """
+    Добавляет или обновляет посты в полнотекстовом индексе пакетно.
+    """
+    if not is_available() or not posts:
+        return
+    ids = [post.pk for post in posts]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM posts_post_fts WHERE rowid IN ({})'.format(
+                ', '.join(['%s'] * len(ids))
+            ),
+            ids
+        )
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)',
+            [(post.pk, normalize(post.text)) for post in posts]
+        )
+
+
+def remove_post(post_id):
+    """
+    Удаляет пост из полнотекстового индекса.
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM posts_post_fts WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Заново строит полнотекстовый индекс по всем постам.
+
+    Нужна после загрузки постов в обход сигналов (bulk_create).
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_post_fts')
+        rows = []
+        posts = Post.objects.values_list('pk', 'text').order_by()
+        for pk, text in posts.iterator(chunk_size=batch_size):
+            rows.append((pk, normalize(text)))
+            if len(rows) >= batch_size:
+                cursor.executemany(
+                    'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)',
+                    rows
+                )
+                rows = []
+        if rows:
+            cursor.executemany(
+                'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)',
+                rows
+            )
+
+
+def search(queryset, keyword):
+    """
+    Фильтрует посты queryset по ключевому слову.
+
+    Добавляет к постам поле search_rank (bm25, меньше - релевантнее).
+    Если полнотекстовый индекс недоступен, ищет по вхождению подстроки.
+    """
+    query = build_query(keyword)
+    if not is_available() or not query:
+        return (queryset.filter(text__icontains=keyword)
+                .annotate(search_rank=Value(0.0, FloatField())))
+    return (queryset.filter(search_index__text__match=query)
+            .annotate(search_rank=F('search_index__rank')))
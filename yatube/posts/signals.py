@@ -0,0 +1,188 @@
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from core.cache import bump_generation
+from . import counters, feed, search, tags, thumbnails
+from .paginator import counts_cache
+from .models import Comment, Follow, Group, Post, TagPost, User
+
+# Поля пользователя, которые выводятся в карточках и комментариях.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def reset_post_counts(post, followers=True):
+    """
+    Сбрасывает кэш страниц с постом: количество постов и поколения списков.
+
+    При followers сбрасываются и ленты подписчиков автора; пакетные
+    изменения сбрасывают их одним запросом на всех авторов.
+    """
+    groups = {post.group_id, getattr(post, 'loaded_group_id', None)}
+    scopes = post.cache_scopes()
+    scopes += [f'group:{group_id}' for group_id in groups - {post.group_id}
+               if group_id]
+    if followers:
+        scopes += feed.follower_scopes((post.author_id,))
+    counts_cache.delete(
+        'posts:index',
+        f'posts:profile:{post.author_id}',
+        *(f'posts:group:{group_id}' for group_id in groups if group_id)
+    )
+    bump_generation(*scopes)
+
+
+def card_scopes(posts):
+    """
+    Возвращает области кэша списков, в которых выводятся карточки постов
+    posts: главная (и страницы тегов), группы и профили авторов и ленты
+    их подписчиков.
+    """
+    rows = set(posts.order_by().values_list('author', 'group').distinct())
+    authors = {author_id for author_id, _ in rows}
+    groups = {group_id for _, group_id in rows if group_id}
+    return (
+        ['index']
+        + [f'group:{group_id}' for group_id in groups]
+        + [f'profile:{author_id}' for author_id in authors]
+        + feed.follower_scopes(authors)
+    )
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    """
+    Запоминает исходные группу и картинку поста, чтобы обработать их смену.
+    """
+    instance.loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance.loaded_image = getattr(image, 'name', image) or ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """
+    Индексирует пост, раскладывает новый пост по лентам подписчиков
+    и при замене картинки ставит в очередь ее миниатюры (или удаление
+    вариантов прежней картинки).
+    """
+    reset_post_counts(instance)
+    search.index_post(instance)
+    image = instance.image.name or ''
+    if image != getattr(instance, 'loaded_image', image):
+        stale = instance.image_variants
+        if instance.thumbnails or instance.image_variants:
+            instance.thumbnails = {}
+            instance.image_variants = {}
+            Post.objects.filter(pk=instance.pk).update(
+                thumbnails={}, image_variants={}
+            )
+        thumbnails.schedule(instance, stale)
+    instance.loaded_image = image
+    if created:
+        counters.change_posts_count(instance.author_id, 1)
+        feed.fan_out_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """
+    Запоминает теги поста, связи с которыми удаляются вместе с ним.
+    """
+    instance.deleted_tag_ids = set(
+        TagPost.objects.filter(post=instance).values_list('tag', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """
+    Удаляет пост из индекса и уменьшает количество постов у автора
+    и тегов.
+    """
+    reset_post_counts(instance)
+    counters.change_posts_count(instance.author_id, -1)
+    search.remove_post(instance.pk)
+    tag_ids = getattr(instance, 'deleted_tag_ids', set())
+    tags.change_tags_count(tag_ids, -1)
+    bump_generation(*(f'tag:{tag_id}' for tag_id in tag_ids))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Увеличивает количество комментариев к посту.
+    """
+    bump_generation(f'post:{instance.post_id}')
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """
+    Уменьшает количество комментариев к посту.
+    """
+    bump_generation(f'post:{instance.post_id}')
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """
+    Увеличивает количество подписчиков автора и добавляет его посты
+    в ленту нового подписчика.
+    """
+    if created:
+        counters.change_followers_count(instance.following_id, 1)
+        feed.follow_added(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """
+    Уменьшает количество подписчиков автора и убирает его посты из ленты
+    отписавшегося пользователя.
+    """
+    counters.change_followers_count(instance.following_id, -1)
+    feed.follow_removed(instance)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    """
+    Сбрасывает кэш списков с постами группы при ее изменении: карточки
+    выводят название группы.
+    """
+    if not created:
+        bump_generation(
+            f'group:{instance.pk}', *card_scopes(instance.posts.all())
+        )
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    """
+    Запоминает исходные имена пользователя, чтобы обработать их смену.
+    """
+    instance.loaded_names = tuple(
+        instance.__dict__.get(field) for field in USER_NAME_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Сбрасывает кэш списков с постами пользователя и страниц с его
+    комментариями при смене имени.
+    """
+    names = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    if not created and names != getattr(instance, 'loaded_names', names):
+        commented = (Comment.objects.filter(author=instance)
+                     .values_list('post', flat=True).distinct())
+        bump_generation(
+            f'profile:{instance.pk}',
+            *card_scopes(Post.objects.filter(author=instance)),
+            *(f'post:{post_id}' for post_id in commented)
+        )
+    instance.loaded_names = names
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from core.cache import CacheNamespace, bump_generation
+from .models import Post, Tag, TagPost
+
+# Посты тега упорядочиваются по ключу индекса (tag, -post) связей.
+TAG_ORDERING = ('-tag_post',)
+
+# Число уровней размера тегов в облаке.
+CLOUD_LEVELS = 5
+
+tags_cache = CacheNamespace('tags')
+
+
+def get_tag_posts(tag):
+    """
+    Возвращает посты с тегом tag с полем tag_post, по которому они
+    упорядочиваются (TAG_ORDERING): страница читается по индексу связей
+    без сортировки.
+    """
+    return Post.objects.filter(tagpost__tag=tag).annotate(
+        tag_post=F('tagpost__post')
+    )
+
+
+def get_tag_cloud():
+    """
+    Возвращает облако из TAG_CLOUD_SIZE самых популярных тегов.
+
+    Каждому тегу задан уровень level от 1 до CLOUD_LEVELS по числу постов.
+    Облако хранится в кэше и сбрасывается при изменении счетчиков тегов.
+    """
+    cloud = tags_cache.get('cloud')
+    if cloud is None:
+        tags = list(
+            Tag.objects.filter(posts_count__gt=0)
+            .order_by('-posts_count', 'name')
+            .values('name', 'posts_count')[:settings.TAG_CLOUD_SIZE]
+        )
+        if tags:
+            largest = tags[0]['posts_count']
+            for tag in tags:
+                tag['level'] = 1 + (CLOUD_LEVELS - 1) * (
+                    tag['posts_count'] - 1
+                ) // max(largest - 1, 1)
+        cloud = sorted(tags, key=lambda tag: tag['name'])
+        tags_cache.set('cloud', cloud)
+    return cloud
+
+
+def change_tags_count(tag_ids, delta):
+    """
+    Изменяет счетчики постов тегов tag_ids на delta и сбрасывает облако.
+    """
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(
+            posts_count=F('posts_count') + delta
+        )
+        tags_cache.delete('cloud')
+
+
+def recount_tags(tag_ids):
+    """
+    Пересчитывает счетчики постов тегов tag_ids по связям и сбрасывает
+    облако.
+    """
+    if tag_ids:
+        tagged = (TagPost.objects.filter(tag=OuterRef('pk'))
+                  .order_by().values('tag')
+                  .annotate(count=Count('pk')).values('count'))
+        Tag.objects.filter(pk__in=tag_ids).update(
+            posts_count=Coalesce(Subquery(tagged), 0)
+        )
+        tags_cache.delete('cloud')
+
+
+def set_post_tags(post, names, created=False):
+    """
+    Заменяет теги поста тегами с названиями names.
+    """
+    set_posts_tags({post: names}, created)
+
+
+def set_posts_tags(tags_by_post, created=False):
+    """
+    Заменяет теги постов: {пост: названия тегов}.
+
+    Теги читаются и создаются пакетно (Tag.get_ids), связи всех постов
+    читаются, удаляются и создаются одним запросом каждое. Счетчики
+    измененных тегов пересчитываются по связям одним запросом: при
+    параллельной записи часть связей может уже существовать или быть
+    удалена, и разница не совпала бы с фактической. Для новых постов
+    (created) текущие связи не читаются.
+    """
+    tags_by_post = {post: set(names) for post, names in tags_by_post.items()}
+    ids = Tag.get_ids(set().union(*tags_by_post.values()))
+    wanted = {(post.pk, ids[name])
+              for post, names in tags_by_post.items() for name in names}
+    current = set() if created else set(
+        TagPost.objects.filter(post__in=list(tags_by_post))
+        .values_list('post', 'tag')
+    )
+    added, removed = wanted - current, current - wanted
+    if removed:
+        condition = Q()
+        for post_id, tag_id in removed:
+            condition |= Q(post_id=post_id, tag_id=tag_id)
+        TagPost.objects.filter(condition).delete()
+    if added:
+        TagPost.objects.bulk_create(
+            [TagPost(post_id=post_id, tag_id=tag_id)
+             for post_id, tag_id in added],
+            ignore_conflicts=True
+        )
+    tag_ids = {tag_id for _, tag_id in added | removed}
+    recount_tags(tag_ids)
+    bump_generation(*(f'tag:{tag_id}' for tag_id in tag_ids))
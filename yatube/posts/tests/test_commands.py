@@ -0,0 +1,232 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F, Sum
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import (AuthorStats, Comment, FeedEntry, Follow, Group,
+                          Post, TagPost)
+
+User = get_user_model()
+
+
+class GenerateDataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(FEED_BACKFILL_SIZE=5)
+    def test_generate_data(self):
+        """Команда создает данные и пересчитывает производные."""
+        call_command(
+            'generate_data', users=20, groups=3, posts=60, comments=40,
+            follows=30, batch_size=25, seed=1, stdout=io.StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), 30)
+        self.assertFalse(Follow.objects.filter(user=F('following')).exists())
+        self.assertEqual(
+            AuthorStats.objects.aggregate(total=Sum('posts_count'))['total'],
+            60
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'], 40
+        )
+        expected = sum(
+            min(Post.objects.filter(author=follow.following).count(), 5)
+            for follow in Follow.objects.all()
+        )
+        self.assertEqual(FeedEntry.objects.count(), expected)
+        post = Post.objects.first()
+        found = search.search(Post.objects.all(), post.text.split()[0])
+        self.assertIn(post, found)
+
+    def test_all_follows(self):
+        """Подписки создаются без повторов, даже если нужны все пары."""
+        call_command(
+            'generate_data', users=8, groups=1, posts=0, comments=0,
+            follows=1000, seed=1, stdout=io.StringIO()
+        )
+        self.assertEqual(Follow.objects.count(), 8 * 7)
+        self.assertFalse(Follow.objects.filter(user=F('following')).exists())
+
+
+class ImportDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_data(self, kind, content, name):
+        err = io.StringIO()
+        call_command('import_data', kind, self.write(name, content),
+                     batch_size=2, stdout=io.StringIO(), stderr=err)
+        return err.getvalue()
+
+    def test_import_posts_jsonl(self):
+        """Посты загружаются из JSONL с датами, группами и тегами."""
+        records = [
+            {'text': 'Пост один', 'author': 'author', 'group': 'group',
+             'pub_date': '2020-01-01T12:00:00', 'tags': ['кот', 'пес']},
+            {'text': 'Пост два', 'author': 'author', 'tags': ['кот']},
+            {'text': 'Пост три', 'author': 'author'},
+            {'text': 'Чужой', 'author': 'nobody'},
+        ]
+        errors = self.import_data('posts', '\n'.join(
+            json.dumps(record, ensure_ascii=False) for record in records
+        ) + '\n{broken\n', 'posts.jsonl')
+        self.assertIn('nobody', errors)
+        self.assertIn('Строка 5', errors)
+        self.assertEqual(Post.objects.count(), 3)
+        post = Post.objects.get(text='Пост один')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(
+            sorted(post.tags.values_list('name', flat=True)), ['кот', 'пес']
+        )
+        self.assertEqual(TagPost.objects.count(), 3)
+        self.assertEqual(self.author.stats.posts_count, 3)
+        new = Post.objects.create(text='Новый', author=self.author)
+        self.assertGreater(new.pk, post.pk)
+
+    def test_import_taken_ids(self):
+        """Записи с занятым id пропускаются, остальные загружаются."""
+        post = Post.objects.create(text='Старый', author=self.author)
+        records = [
+            {'id': post.pk, 'text': 'Занятый', 'author': 'author'},
+            {'id': post.pk + 1, 'text': 'Новый', 'author': 'author'},
+            {'id': post.pk + 1, 'text': 'Повтор', 'author': 'author'},
+            {'text': 'Без id', 'author': 'author'},
+        ]
+        errors = self.import_data('posts', '\n'.join(
+            json.dumps(record, ensure_ascii=False) for record in records
+        ), 'posts.jsonl')
+        self.assertIn('Строка 1', errors)
+        self.assertIn('Строка 3', errors)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Без id', 'Новый', 'Старый']
+        )
+        self.assertEqual(self.author.stats.posts_count, 3)
+        self.import_data('comments', (
+            'id,post,author,text\n'
+            f'1,{post.pk},reader,Первый\n'
+            f'1,{post.pk},reader,Повтор\n'
+        ), 'comments.csv')
+        errors = self.import_data('comments', (
+            'id,post,author,text\n'
+            f'1,{post.pk},reader,Снова\n'
+        ), 'comments.csv')
+        self.assertIn('id 1 уже занят', errors)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)), ['Первый']
+        )
+
+    def test_import_comments_and_follows_csv(self):
+        """Комментарии и подписки загружаются из CSV."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.import_data('comments', (
+            'post,author,text,created\n'
+            f'{post.pk},reader,Первый,2021-05-01T10:00:00+00:00\n'
+            f'{post.pk},reader,Второй,\n'
+            '999,reader,Потерянный,\n'
+        ), 'comments.csv')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertFalse(Comment.objects.filter(path='').exists())
+        self.assertEqual(
+            Comment.objects.get(text='Первый').created.year, 2021
+        )
+        new = Comment.objects.create(post=post, author=self.author, text='3')
+        self.assertGreater(new.created.year, 2021)
+        self.import_data('follows', (
+            'user,following\nreader,author\nreader,author\nreader,reader\n'
+        ), 'follows.csv')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+
+    def test_import_tags(self):
+        """Теги назначаются постам из файла."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.import_data('tags', (
+            f'{{"post": {post.pk}, "tag": "кот"}}\n'
+            f'{{"post": {post.pk}, "tag": "пес"}}\n'
+        ), 'tags.jsonl')
+        self.assertEqual(post.tags.count(), 2)
+
+
+class ExportDataTest(TestCase):
+    def test_export_import_roundtrip(self):
+        """Выгрузка команды export_data загружается командой import_data."""
+        author = User.objects.create(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(text='Первый, "с кавычками"', author=author,
+                            group=group)
+        Post.objects.create(text='Второй', author=author)
+        expected = list(Post.objects.order_by('pk').values_list(
+            'text', 'author', 'group', 'pub_date'
+        ))
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in ('ndjson', 'csv'):
+                path = os.path.join(directory, f'posts.{file_format}')
+                call_command('export_data', 'posts', format=file_format,
+                             output=path, chunk_size=1)
+                Post.objects.all().delete()
+                call_command('import_data', 'posts', path,
+                             stdout=io.StringIO())
+                self.assertEqual(list(
+                    Post.objects.order_by('pk').values_list(
+                        'text', 'author', 'group', 'pub_date'
+                    )
+                ), expected)
+
+    def test_comment_replies_roundtrip(self):
+        """Ответы выгружаются с родителем и загружаются с путями."""
+        author = User.objects.create(username='author')
+        post = Post.objects.create(text='Текст', author=author)
+        root = Comment.objects.create(post=post, author=author, text='1')
+        child = Comment.objects.create(post=post, author=author, text='1.1',
+                                       parent=root)
+        Comment.objects.create(post=post, author=author, text='1.1.1',
+                               parent=child)
+        Comment.objects.create(post=post, author=author, text='2')
+        fields = ('pk', 'parent', 'depth', 'path', 'text')
+        expected = list(Comment.objects.order_by('pk').values_list(*fields))
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format in ('ndjson', 'csv'):
+                path = os.path.join(directory, f'comments.{file_format}')
+                call_command('export_data', 'comments', format=file_format,
+                             output=path)
+                Comment.objects.all().delete()
+                call_command('import_data', 'comments', path,
+                             stdout=io.StringIO())
+                self.assertEqual(list(
+                    Comment.objects.order_by('pk').values_list(*fields)
+                ), expected)
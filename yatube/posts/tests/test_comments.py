@@ -0,0 +1,229 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.comments import get_threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentsPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        for i in range(12):
+            author = User.objects.create(username=f'user_{i}')
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий_{i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_load_more(self):
+        """«Показать еще» подгружает все комментарии по курсору."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        page_obj = response.context['page_obj']
+        texts = [comment.text for comment in page_obj]
+        while page_obj.has_next():
+            response = self.client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'cursor': page_obj.next_cursor}
+            )
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            page_obj = response.context['page_obj']
+            texts += [comment.text for comment in page_obj]
+        # Количество не считается запросом и точно только на последней
+        # странице.
+        self.assertEqual(page_obj.paginator.count, 12)
+        self.assertEqual(
+            texts, [f'Комментарий_{i}' for i in reversed(range(12))]
+        )
+
+    def test_json(self):
+        """При format=json комментарии возвращаются в JSON."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual(data['count'], 12)
+        self.assertEqual(data['results'][0]['author'], 'user_11')
+        self.assertEqual(data['results'][0]['text'], 'Комментарий_11')
+        ids = [comment['id'] for comment in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            ids += [comment['id'] for comment in data['results']]
+        self.assertEqual(
+            ids,
+            list(Comment.objects.filter(post=self.post)
+                 .order_by('-created', '-pk').values_list('pk', flat=True))
+        )
+
+    def test_query_count(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=User.objects.get(username=f'user_{i}'),
+                    text='Текст')
+            for i in range(12)
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
+
+    def test_missing_post(self):
+        """Комментарии несуществующего поста возвращают 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        cls.other_post = Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def reply(self, parent=None, text='Ответ'):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text, parent=parent
+        )
+
+    def test_path(self):
+        """Путь ответа продолжает путь родителя, глубина растет на 1."""
+        root = self.reply()
+        child = self.reply(root)
+        grandchild = self.reply(child)
+        width = Comment.PATH_WIDTH
+        self.assertEqual(root.path, str(root.pk).zfill(width))
+        self.assertEqual(child.path, root.path + str(child.pk).zfill(width))
+        self.assertTrue(grandchild.path.startswith(child.path))
+        self.assertEqual(
+            [root.depth, child.depth, grandchild.depth], [0, 1, 2]
+        )
+        self.assertEqual(Comment.objects.get(pk=child.pk).path, child.path)
+
+    def test_long_ids(self):
+        """Ветки с id разной длины не пересекаются и идут по порядку id."""
+        short = Comment.objects.create(
+            pk=10 ** 9, post=self.post, author=self.user, text='Короткий'
+        )
+        long = Comment.objects.create(
+            pk=10 ** 10, post=self.post, author=self.user, text='Длинный'
+        )
+        self.reply(long, 'Ответ длинному')
+        self.reply(short, 'Ответ короткому')
+        self.assertEqual(
+            [comment.text for comment in get_threads([short])],
+            ['Короткий', 'Ответ короткому']
+        )
+        self.assertEqual(
+            list(Comment.objects.order_by('path')
+                 .values_list('text', flat=True)),
+            ['Короткий', 'Ответ короткому', 'Длинный', 'Ответ длинному']
+        )
+
+    def test_threads(self):
+        """Ветки читаются одним запросом в порядке ответов."""
+        first, second = self.reply(text='1'), self.reply(text='2')
+        first_1 = self.reply(first, '1.1')
+        self.reply(second, '2.1')
+        self.reply(first_1, '1.1.1')
+        self.reply(first, '1.2')
+        with self.assertNumQueries(1):
+            comments = get_threads([second, first])
+        self.assertEqual(
+            [(comment.text, comment.level) for comment in comments],
+            [('2', 0), ('2.1', 1), ('1', 0), ('1.1', 1), ('1.1.1', 2),
+             ('1.2', 1)]
+        )
+        comments = get_threads([first_1, second], depth=0)
+        self.assertEqual([comment.text for comment in comments],
+                         ['1.1', '2'])
+
+    def test_post_detail(self):
+        """Страница поста показывает ответы под комментарием."""
+        root = self.reply(text='Корень')
+        self.reply(self.reply(root, 'Ответ'), 'Ответ на ответ')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']()],
+            ['Корень', 'Ответ', 'Ответ на ответ']
+        )
+        self.assertContains(response, 'Ответ на ответ')
+
+    def test_comment_thread(self):
+        """Страница ветки показывает поддерево и форму ответа."""
+        root = self.reply(text='Корень')
+        child = self.reply(root, 'Ответ')
+        self.reply(text='Другая ветка')
+        response = self.client.get(reverse(
+            'posts:comment_thread',
+            kwargs={'post_id': self.post.pk, 'comment_id': child.pk}
+        ))
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Ответ']
+        )
+        self.assertEqual(response.context['reply_to'], child)
+        response = self.client.get(reverse(
+            'posts:comment_thread',
+            kwargs={'post_id': self.other_post.pk, 'comment_id': child.pk}
+        ))
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_reply(self):
+        """Ответ добавляется только к комментарию того же поста."""
+        root = self.reply()
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        self.client.post(url, {'text': 'Ответ', 'parent': root.pk})
+        reply = Comment.objects.get(text='Ответ', parent=root)
+        self.assertEqual(reply.depth, 1)
+        other_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.other_post.pk}
+        )
+        self.client.post(other_url, {'text': 'Чужой', 'parent': root.pk})
+        self.assertFalse(Comment.objects.filter(text='Чужой').exists())
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_max_depth(self):
+        """Ответ глубже COMMENT_MAX_DEPTH не добавляется."""
+        child = self.reply(self.reply())
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        self.client.post(url, {'text': 'Глубоко', 'parent': child.pk})
+        self.assertFalse(Comment.objects.filter(text='Глубоко').exists())
+
+    def test_cascade(self):
+        """Удаление комментария удаляет ветку и уменьшает счетчик."""
+        root = self.reply()
+        self.reply(self.reply(root))
+        Comment.objects.get(pk=root.pk).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
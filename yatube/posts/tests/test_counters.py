@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Post
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_counters_follow_create_and_delete(self):
+        """Счетчики меняются при создании и удалении постов и комментариев."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        Post.objects.create(text='Текст', author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Текст'
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(self.user.stats.posts_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        post.delete()
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).posts_count, 1
+        )
+
+    def test_post_save_keeps_counter(self):
+        """Сохранение устаревшего экземпляра поста не сбрасывает счетчик."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_post_copy_and_resave(self):
+        """Копия поста и сохранение удаленного поста вставляют строку."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        post.pk = None
+        post.save()
+        self.assertEqual(Post.objects.count(), 2)
+        Post.objects.filter(pk=post.pk).delete()
+        post.save()
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+
+    def test_profile_uses_counter(self):
+        """Профиль показывает количество постов без COUNT-запроса."""
+        Post.objects.create(text='Текст', author=self.user)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_profile_creates_missing_counter(self):
+        """Профиль создает недостающий счетчик по фактическим данным."""
+        Post.objects.bulk_create(
+            [Post(text='Текст', author=self.user) for _ in range(2)]
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username])
+        )
+        self.assertEqual(response.context['posts_count'], 2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).posts_count, 2
+        )
+
+    def test_reconcile_command(self):
+        """Команда reconcile_counters исправляет расхождения счетчиков."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.user, text='Текст')
+             for _ in range(3)]
+        )
+        AuthorStats.objects.filter(user=self.user).update(posts_count=10)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 3)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.user).posts_count, 1
+        )
+        self.assertIn('постов - 1, авторов - 1', out.getvalue())
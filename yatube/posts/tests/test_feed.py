@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counters import reconcile
+from posts.models import AuthorStats, FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='writer')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def get_feed_posts(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика."""
+        Follow.objects.create(user=self.user, following=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.get_feed_posts(), [post])
+
+    def test_follow_backfills_and_unfollow_clears_feed(self):
+        """Подписка заполняет ленту, отписка очищает ее."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.get_feed_posts(), [post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_feed_posts(), [])
+
+    def test_deleted_post_leaves_feed(self):
+        """Удаленный пост исчезает из ленты."""
+        Follow.objects.create(user=self.user, following=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        post.delete()
+        self.assertEqual(self.get_feed_posts(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_on_request(self):
+        """Посты авторов с большим числом подписчиков читаются при запросе."""
+        old_post = Post.objects.create(text='Старый пост', author=self.author)
+        Follow.objects.create(user=self.user, following=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_feed_posts(), [new_post, old_post])
+
+    def test_followers_count(self):
+        """Счетчик подписчиков меняется при подписке и отписке."""
+        follow = Follow.objects.create(user=self.user, following=self.author)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        follow.delete()
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).followers_count, 0
+        )
+        AuthorStats.objects.filter(user=self.author).update(followers_count=5)
+        reconcile()
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_fan_out_checks_only_post_author(self):
+        """Раскладка поста не читает подписки других авторов."""
+        Follow.objects.create(user=self.user, following=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(text='Пост', author=self.author)
+        follow_table = Follow._meta.db_table
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if follow_table in query['sql'] and 'GROUP BY' in query['sql']
+        ])
+
+    @override_settings(FEED_WORKERS=1)
+    def test_background_fan_out(self):
+        """В фоне пост раскладывается после фиксации транзакции."""
+        Follow.objects.create(user=self.user, following=self.author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        with mock.patch('core.tasks.get_executor') as get_executor:
+            for callback in callbacks:
+                callback()
+        get_executor.return_value.submit.assert_called_once()
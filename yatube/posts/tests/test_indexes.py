@@ -0,0 +1,164 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from posts.models import Comment, Follow, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+FULL_SCAN_RE = re.compile(r'\bSCAN (?:TABLE )?posts_\w+(?! USING)\b')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.author = User.objects.create(username='testauthor')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='test-slug',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.user, following=cls.author)
+        cls.tag = Tag.objects.create(name='тег', posts_count=15)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                text=f'Текст_{i}',
+                author=cls.author,
+                group=cls.group,
+            )
+            cls.comment = Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий_{i}'
+            )
+            TagPost.objects.create(post=cls.post, tag=cls.tag)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_login(self.user)
+        self.client.force_authenticate(self.user)
+
+    def get_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_hot_queries_use_indexes(self):
+        """Запросы страниц со списками не сканируют таблицы целиком."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:comment_thread', kwargs={
+                'post_id': self.post.pk, 'comment_id': self.comment.pk
+            }),
+            reverse('posts:follow_index'),
+            reverse('posts:tag_list'),
+            reverse('posts:tag_posts', kwargs={'name': self.tag.name}),
+            '/api/v1/posts/?page_size=5',
+            f'/api/v1/posts/?page_size=5&tag={self.tag.name}',
+            f'/api/v1/posts/{self.post.pk}/comments/?page_size=5',
+            f'/api/v1/posts/{self.post.pk}/comments/tree/?page_size=5',
+            f'/api/v1/posts/{self.post.pk}/comments/{self.comment.pk}/thread/',
+            '/api/v1/follow/?page_size=5',
+        )
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                plan = self.get_plan(sql)
+                with self.subTest(url=url, sql=sql):
+                    self.assertFalse(
+                        any(FULL_SCAN_RE.search(step) for step in plan), plan
+                    )
+                    self.assertNotIn(TEMP_SORT, plan)
+
+
+class MigrationTest(TransactionTestCase):
+    """
+    Проверка миграции данных: база переводится в состояние before,
+    заполняется и переводится в состояние after.
+    """
+    before = after = None
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+
+class UniqueFollowMigrationTest(MigrationTest):
+    before = [('posts', '0012_auto_20261018_1946')]
+    after = [('posts', '0013_indexes')]
+
+    def test_duplicates_removed(self):
+        """Миграция оставляет первую из повторяющихся подписок."""
+        apps = self.migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Follow = apps.get_model('posts', 'Follow')
+        user, author, other = (
+            User.objects.create(username=name)
+            for name in ('user', 'author', 'other')
+        )
+        first = Follow.objects.create(user=user, following=author)
+        Follow.objects.create(user=user, following=author)
+        Follow.objects.create(user=user, following=author)
+        single = Follow.objects.create(user=user, following=other)
+        reverse_follow = Follow.objects.create(user=author, following=user)
+        apps = self.migrate(self.after)
+        Follow = apps.get_model('posts', 'Follow')
+        self.assertEqual(
+            set(Follow.objects.values_list('pk', flat=True)),
+            {first.pk, single.pk, reverse_follow.pk}
+        )
+
+
+class CommentPathMigrationTest(MigrationTest):
+    before = [('posts', '0021_reset_image_variants')]
+    after = [('posts', '0022_comment_path_width')]
+
+    def test_paths_widened(self):
+        """Миграция дополняет сегменты путей комментариев до 20 цифр."""
+        apps = self.migrate(self.before)
+        User = apps.get_model('auth', 'User')
+        Post = apps.get_model('posts', 'Post')
+        Comment = apps.get_model('posts', 'Comment')
+        user = User.objects.create(username='user')
+        post = Post.objects.create(text='Текст', author=user)
+        root = Comment.objects.create(post=post, author=user, text='1')
+        child = Comment.objects.create(
+            post=post, author=user, text='1.1', parent=root, depth=1
+        )
+        root.path = str(root.pk).zfill(10)
+        child.path = root.path + str(child.pk).zfill(10)
+        Comment.objects.bulk_update([root, child], ('path',))
+        apps = self.migrate(self.after)
+        Comment = apps.get_model('posts', 'Comment')
+        self.assertEqual(
+            dict(Comment.objects.values_list('pk', 'path')),
+            {root.pk: str(root.pk).zfill(20),
+             child.pk: str(root.pk).zfill(20) + str(child.pk).zfill(20)}
+        )
@@ -7,7 +7,7 @@ User = get_user_model()
 
 
 class PostModelTest(TestCase):
-    
+
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -58,4 +58,51 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value
-                )
\ No newline at end of file
+                )
+
+
+class PostExcerptTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test')
+
+    def setUp(self):
+        self.text = 'слово ' * 100
+        self.excerpt = Post.make_excerpt(self.text)
+
+    def test_excerpt(self):
+        """Отрывок не длиннее EXCERPT_LENGTH и обновляется с текстом."""
+        self.assertLessEqual(len(self.excerpt), Post.EXCERPT_LENGTH)
+        self.assertTrue(self.excerpt.endswith('…'))
+        post = Post.objects.create(text=self.text, author=self.user)
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, self.excerpt)
+        post.text = 'Короткий'
+        post.save(update_fields=['text'])
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, 'Короткий')
+        Post.objects.filter(pk=post.pk).update(text='Новый')
+        self.assertEqual(Post.objects.get(pk=post.pk).excerpt, 'Новый')
+
+    def test_bulk(self):
+        """bulk_create и bulk_update заполняют отрывок."""
+        Post.objects.bulk_create([Post(text=self.text, author=self.user)])
+        self.assertEqual(Post.objects.get().excerpt, self.excerpt)
+        post = Post.objects.get()
+        post.text = 'Текст'
+        Post.objects.bulk_update([post], ['text'])
+        self.assertEqual(Post.objects.get().excerpt, 'Текст')
+
+    def test_for_cards(self):
+        """Карточки читают отрывок без полного текста."""
+        Post.objects.create(text=self.text, author=self.user)
+        post = Post.objects.for_cards().get()
+        self.assertIn('text', post.get_deferred_fields())
+        self.assertEqual(post.excerpt, self.excerpt)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(post), self.text[:15])
+        self.assertEqual(str(Post(text=self.text)), self.text[:15])
+        post.save()
+        self.assertEqual(Post.objects.get().text, self.text)
+        self.assertNotIn(
+            'text', Post.objects.with_tags().get().get_deferred_fields()
+        )
@@ -1,7 +1,14 @@
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Post, Group
+from posts.models import Post, Group, Tag, TagPost
+from posts.paginator import KeysetPaginator
 
 User = get_user_model()
 
@@ -45,4 +52,142 @@ class PaginatorViewsTest(TestCase):
         for name in self.reverse_names:
             with self.subTest(name=name):
                 response = self.authorized_client.get(name+'?page=2')
-                self.assertEqual(len(response.context['page_obj']), 3)
\ No newline at end of file
+                self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        for i in range(25):
+            Post.objects.create(text=f'Текст_{i}', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_cursor_navigation(self):
+        """Страницы по курсору совпадают со страницами по номеру."""
+        url = reverse('posts:index')
+        page_1 = self.client.get(url).context['page_obj']
+        page_2 = self.client.get(
+            url, {'cursor': page_1.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(page_2.number, 2)
+        self.assertEqual(
+            list(page_2),
+            list(self.client.get(url, {'page': 2}).context['page_obj'])
+        )
+        page_3 = self.client.get(
+            url, {'cursor': page_2.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(page_3), 5)
+        self.assertFalse(page_3.has_next())
+        back = self.client.get(
+            url, {'cursor': page_3.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(back.number, 2)
+        self.assertEqual(list(back), list(page_2))
+
+    @skipUnless(connection.vendor == 'sqlite', 'План запроса SQLite')
+    def test_deep_cursor_uses_index_range(self):
+        """Страница по курсору читается по диапазону индекса без сортировки."""
+        paginator = KeysetPaginator(Post.objects.all(), 2, exact_count=False)
+        page = paginator.page(1)
+        for _ in range(8):
+            page = paginator.cursor_page(page.next_cursor)
+        self.assertEqual(page.number, 9)
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            paginator.cursor_page(page.next_cursor)
+        sql, params = queries[-1]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('SEARCH', plan)
+        self.assertNotIn('SCAN', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор возвращает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+    def test_count_without_count_query(self):
+        """Без точного подсчета количество оценивается по странице."""
+        paginator = KeysetPaginator(
+            Post.objects.all(), 10, exact_count=False
+        )
+        with self.assertNumQueries(1):
+            page = paginator.get_page(1)
+            self.assertTrue(page.has_next())
+            self.assertEqual(paginator.num_pages, 2)
+        with self.assertNumQueries(1):
+            paginator.get_page(3)
+            self.assertEqual(paginator.count, 25)
+
+    def test_pages_from_end(self):
+        """Страницы второй половины, читаемые с конца, совпадают с OFFSET."""
+        posts = list(Post.objects.order_by('-pub_date', '-pk'))
+        paginator = KeysetPaginator(Post.objects.all(), 4)
+        for number in range(1, 8):
+            with self.subTest(number=number):
+                page = paginator.page(number)
+                self.assertEqual(
+                    list(page), posts[(number - 1) * 4:number * 4]
+                )
+                self.assertEqual(page.has_next(), number < 7)
+        with CaptureQueriesContext(connection) as context:
+            paginator.page(7)
+        self.assertNotIn('OFFSET 24', context.captured_queries[-1]['sql'])
+
+    @override_settings(POSTS_PER_PAGE=4)
+    def test_drifted_count(self):
+        """Отставший счетчик тега не сдвигает страницы второй половины."""
+        tag = Tag.objects.create(name='тег')
+        TagPost.objects.bulk_create(
+            TagPost(tag=tag, post=post) for post in Post.objects.all()
+        )
+        Tag.objects.filter(pk=tag.pk).update(posts_count=25 + 3)
+        url = reverse('posts:tag_posts', kwargs={'name': tag.name})
+        texts = []
+        for number in range(1, 8):
+            page_obj = self.client.get(url, {'page': number}).context[
+                'page_obj'
+            ]
+            texts += [post.text for post in page_obj]
+        self.assertEqual(
+            texts, [f'Текст_{i}' for i in reversed(range(25))]
+        )
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_page_links(self):
+        """Пагинатор выводит соседние и крайние страницы."""
+        url = reverse('posts:index')
+        page_obj = self.client.get(url, {'page': 12}).context['page_obj']
+        self.assertEqual(
+            page_obj.page_links,
+            [1, Paginator.ELLIPSIS, 10, 11, 12, 13, 14, Paginator.ELLIPSIS,
+             25]
+        )
+        content = self.client.get(url).content.decode()
+        self.assertIn('href="?page=25"', content)
+        self.assertNotIn('href="?page=20"', content)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_links_keep_query(self):
+        """Ссылки страниц поиска сохраняют запрос, последней страницы нет."""
+        response = self.client.get(reverse('posts:index'), {'q': 'Текст'})
+        paginator = response.context['page_obj'].paginator
+        self.assertFalse(paginator.count_is_exact)
+        content = response.content.decode()
+        self.assertIn('q=%D0%A2%D0%B5%D0%BA%D1%81%D1%82&amp;cursor=', content)
+        self.assertNotIn('Последняя', content)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import resolve, reverse
+
+from posts.models import Comment, Follow, Group, Post, Tag, TagPost
+
+User = get_user_model()
+
+
+class QueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.tag = Tag.objects.create(name='тег')
+        # Полная страница профиля: посты с группой, тегом и картинкой,
+        # миниатюры которых еще не готовы. Посты старше остальных, чтобы
+        # не попасть на первые страницы ленты, группы и тега.
+        cls.writer = User.objects.create(username='writer')
+        group = Group.objects.create(title='Другая группа', slug='other')
+        tag = Tag.objects.create(name='другой')
+        for i in range(settings.POSTS_PER_PAGE + 1):
+            post = Post.objects.create(
+                text=f'Пост_{i}', author=cls.writer, group=group,
+                image=f'posts/image_{i}.png'
+            )
+            TagPost.objects.create(tag=tag, post=post)
+        for i in range(10):
+            author = User.objects.create(username=f'author_{i}')
+            Follow.objects.create(user=cls.user, following=author)
+            cls.post = Post.objects.create(
+                text=f'Текст_{i}', author=author, group=cls.group
+            )
+            TagPost.objects.create(tag=cls.tag, post=cls.post)
+            Comment.objects.create(
+                post=cls.post, author=author, text='Текст'
+            )
+        for i in range(10):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text='Текст'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_urls(self):
+        """
+        Возвращает {адрес: число запросов} страниц с карточками постов
+        и комментариями. Два запроса - сессия и пользователь.
+        """
+        return {
+            reverse('posts:index'): 4,
+            reverse('posts:index') + '?q=Текст': 3,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 4,
+            reverse('posts:profile', kwargs={'username': 'writer'}): 8,
+            reverse('posts:follow_index'): 4,
+            reverse('posts:tag_posts', kwargs={'name': self.tag.name}): 4,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}): 7,
+            reverse('posts:post_comments',
+                    kwargs={'post_id': self.post.pk}): 3,
+        }
+
+    def test_query_count(self):
+        """Число запросов страниц не зависит от числа постов на них."""
+        for url, queries in self.get_urls().items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    self.client.get(url)
+
+    def test_cached_fragment_skips_page(self):
+        """При попадании в кэш фрагмента страница постов не читается."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, 'Текст_9')
+
+    def test_query_budgets(self):
+        """Для каждой страницы задан бюджет запросов с запасом."""
+        for url, queries in self.get_urls().items():
+            view_name = resolve(url.split('?')[0]).view_name
+            with self.subTest(view_name=view_name):
+                self.assertGreaterEqual(
+                    settings.QUERY_BUDGETS[view_name], queries
+                )
@@ -0,0 +1,97 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.models import Post
+from posts.search import stem
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.cats = Post.objects.create(
+            text='Красивые кошки гуляли по крыше', author=cls.user
+        )
+        cls.cat = Post.objects.create(
+            text='Кошка и кошки, кошками о кошках', author=cls.user
+        )
+        cls.dogs = Post.objects.create(
+            text='Собаки охраняли дом', author=cls.user
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def search(self, keyword):
+        response = self.client.get(reverse('posts:index'), {'q': keyword})
+        return list(response.context['page_obj'])
+
+    def test_stem(self):
+        """Формы слова приводятся к одной основе."""
+        for word in ('кошка', 'кошки', 'кошками', 'кошках'):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), 'кошк')
+
+    def test_search_matches_word_forms_and_ranks(self):
+        """Поиск находит формы слова и сортирует по релевантности."""
+        self.assertEqual(self.search('кошкой'), [self.cat, self.cats])
+        self.assertEqual(self.search('Собака'), [self.dogs])
+        self.assertEqual(self.search('крыш кошки'), [self.cats])
+        self.assertEqual(self.search('лошадь'), [])
+
+    def test_prefix_search(self):
+        """Поиск находит слова по началу."""
+        self.assertEqual(self.search('охра'), [self.dogs])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(text='Ежи спали', author=self.user)
+        self.assertEqual(self.search('ежи'), [post])
+        post.text = 'Коты спали'
+        post.save()
+        self.assertEqual(self.search('коты'), [post])
+        self.assertEqual(self.search('ежи'), [])
+        post.delete()
+        self.assertEqual(self.search('коты'), [])
+
+    def test_rebuild_search_index_command(self):
+        """Команда заново индексирует посты, загруженные в обход сигналов."""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        self.assertEqual(self.search('кошки'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('кошки'), [self.cat, self.cats])
+
+    def test_api_search(self):
+        """Параметр search API использует полнотекстовый индекс."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/posts/', {'search': 'кошкам'})
+        self.assertEqual(
+            [post['id'] for post in response.json()],
+            [self.cat.id, self.cats.id]
+        )
+
+    def test_search_cursor_pagination(self):
+        """Результаты поиска листаются по курсору без повторов."""
+        for i in range(12):
+            Post.objects.create(text='лиса ' * (i + 1), author=self.user)
+        url = reverse('posts:index')
+        page_1 = self.client.get(url, {'q': 'лиса'}).context['page_obj']
+        page_2 = self.client.get(
+            url, {'q': 'лиса', 'cursor': page_1.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(page_1), 10)
+        self.assertEqual(len(page_2), 2)
+        self.assertFalse(set(page_1) & set(page_2))
@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.counters import reconcile
+from posts.models import Post, Tag
+from posts.tags import get_tag_cloud, set_post_tags
+
+User = get_user_model()
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+        cls.posts = [
+            Post.objects.create(text=f'Текст_{i}', author=cls.user)
+            for i in range(13)
+        ]
+        for post in cls.posts:
+            set_post_tags(post, ['кот'], created=True)
+        set_post_tags(cls.posts[0], ['кот', 'пес'])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_tag_counts(self):
+        """Счетчики тегов меняются при изменении тегов и удалении поста."""
+        self.assertEqual(Tag.objects.get(name='кот').posts_count, 13)
+        self.assertEqual(Tag.objects.get(name='пес').posts_count, 1)
+        set_post_tags(self.posts[0], ['пес', 'еж'])
+        Post.objects.get(pk=self.posts[1].pk).delete()
+        counts = dict(Tag.objects.values_list('name', 'posts_count'))
+        self.assertEqual(counts, {'кот': 11, 'пес': 1, 'еж': 1})
+        Tag.objects.update(posts_count=0)
+        self.assertEqual(reconcile()[2], 3)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'posts_count')), counts
+        )
+
+    def test_tag_counts_existing_links(self):
+        """Уже существующие связи (параллельная запись) не меняют счетчик."""
+        set_post_tags(self.posts[0], ['кот', 'пес'], created=True)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'posts_count')),
+            {'кот': 13, 'пес': 1}
+        )
+
+    def test_tag_page(self):
+        """Страница тега листает посты тега по курсору."""
+        url = reverse('posts:tag_posts', kwargs={'name': 'кот'})
+        response = self.client.get(url)
+        first = list(response.context['page_obj'])
+        self.assertEqual(len(first), 10)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'cursor': cursor})
+        second = list(response.context['page_obj'])
+        self.assertEqual(first + second, self.posts[::-1])
+        response = self.client.get(
+            reverse('posts:tag_posts', kwargs={'name': 'нет'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_with_slash(self):
+        """Теги с '/' и '?' открываются по ссылкам из облака и карточек."""
+        post = Post.objects.create(text='Текст', author=self.user)
+        set_post_tags(post, ['ci/cd', 'что?'], created=True)
+        response = self.client.get(reverse('posts:tag_list'))
+        self.assertEqual(response.status_code, 200)
+        for name in ('ci/cd', 'что?'):
+            with self.subTest(name=name):
+                url = reverse('posts:tag_posts', kwargs={'name': name})
+                self.assertContains(response, f'href="{url}"')
+                response_tag = self.client.get(url)
+                self.assertEqual(response_tag.context['tag'].name, name)
+                self.assertEqual(
+                    list(response_tag.context['page_obj']), [post]
+                )
+
+    def test_tag_cloud(self):
+        """Облако тегов кэшируется и сбрасывается при изменении тегов."""
+        response = self.client.get(reverse('posts:tag_list'))
+        self.assertContains(response, reverse(
+            'posts:tag_posts', kwargs={'name': 'кот'}
+        ))
+        with self.assertNumQueries(0):
+            cloud = get_tag_cloud()
+        self.assertEqual(
+            [(tag['name'], tag['level']) for tag in cloud],
+            [('кот', 5), ('пес', 1)]
+        )
+        set_post_tags(self.posts[2], ['кот', 'еж'])
+        self.assertEqual(
+            [tag['name'] for tag in get_tag_cloud()], ['еж', 'кот', 'пес']
+        )
+
+    def test_api_tag_filter(self):
+        """Фильтр API ?tag= возвращает посты тега по страницам."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/posts/', {'tag': 'пес'})
+        self.assertEqual(
+            [post['id'] for post in response.json()], [self.posts[0].pk]
+        )
+        response = client.get(
+            '/api/v1/posts/', {'tag': 'кот', 'page_size': 10}
+        ).json()
+        next_page = client.get(response['next']).json()
+        self.assertEqual(response['count'], 13)
+        self.assertEqual(
+            [post['id'] for post in response['results']
+             + next_page['results']],
+            [post.pk for post in self.posts[::-1]]
+        )
@@ -0,0 +1,268 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from posts.models import Post
+from posts.thumbnails import resolve_thumbnails
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='image.png', size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def make_photo(name='photo.jpg', size=(1000, 500)):
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Камера'
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='testuser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertThumbnailsExist(self, post):
+        self.assertEqual(set(post.thumbnails), set(settings.THUMBNAIL_SIZES))
+        for url in post.thumbnails.values():
+            path = os.path.join(TEMP_MEDIA_ROOT, url[len(settings.MEDIA_URL):])
+            self.assertTrue(os.path.exists(path))
+
+    def test_thumbnails_on_create_and_edit(self):
+        """Миниатюры готовятся при загрузке и замене картинки."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_image()
+        )
+        post.refresh_from_db()
+        self.assertThumbnailsExist(post)
+        first = post.thumbnails
+        post.image = make_image('other.png', (300, 400))
+        post.save()
+        post.refresh_from_db()
+        self.assertThumbnailsExist(post)
+        self.assertNotEqual(post.thumbnails, first)
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, {})
+
+    def test_text_edit_keeps_thumbnails(self):
+        """Изменение текста не перезапускает подготовку миниатюр."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_image()
+        )
+        post = Post.objects.get(pk=post.pk)
+        Post.objects.filter(pk=post.pk).update(thumbnails={'card': 'x'})
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, {'card': 'x'})
+
+    def test_templates_use_stored_thumbnails(self):
+        """Шаблоны выводят сохраненные адреса миниатюр."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_image()
+        )
+        post.refresh_from_db()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnails['card'])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, post.thumbnails['detail'])
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_background_generation(self):
+        """В фоне миниатюры готовятся после фиксации транзакции."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(
+                text='Текст', author=self.user, image=make_image()
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, {})
+        with mock.patch('core.tasks.get_executor') as get_executor:
+            for callback in callbacks:
+                callback()
+        get_executor.return_value.submit.assert_called_once()
+
+    def test_generate_thumbnails_command(self):
+        """Команда готовит миниатюры постов без них."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_image()
+        )
+        Post.objects.filter(pk=post.pk).update(thumbnails={})
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertThumbnailsExist(post)
+
+    def test_resolve_page_in_one_lookup(self):
+        """Миниатюры страницы находятся одним пакетным запросом."""
+        for i in range(3):
+            Post.objects.create(
+                text=f'Текст_{i}', author=self.user, image=make_image()
+            )
+        expected = {post.pk: post.thumbnails for post in Post.objects.all()}
+        Post.objects.update(thumbnails={})
+        posts = list(Post.objects.all())
+        cache.clear()
+        with self.assertNumQueries(1):
+            resolve_thumbnails(posts)
+        self.assertEqual(
+            {post.pk: post.thumbnails for post in posts}, expected
+        )
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            resolve_thumbnails(posts)
+        self.assertEqual(
+            {post.pk: post.thumbnails for post in posts}, expected
+        )
+
+    def get_path(self, url):
+        return os.path.join(TEMP_MEDIA_ROOT, url[len(settings.MEDIA_URL):])
+
+    def test_image_variants(self):
+        """Варианты картинки готовятся по ширинам без метаданных EXIF."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_photo()
+        )
+        post.refresh_from_db()
+        variants = post.image_variants['detail']['webp']
+        widths = [width for width, _ in variants]
+        self.assertEqual(widths, [320, 500])
+        for width, url in variants:
+            with Image.open(self.get_path(url)) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, width)
+                self.assertGreater(image.height, image.width)
+                self.assertEqual(len(image.getexif()), 0)
+
+    def test_variants_cropped_as_thumbnail(self):
+        """Варианты карточки кадрируются так же, как ее миниатюра."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_photo()
+        )
+        post.refresh_from_db()
+        variants = post.image_variants['card']['webp']
+        self.assertEqual([width for width, _ in variants], [320, 500])
+        for width, url in variants:
+            with Image.open(self.get_path(url)) as image:
+                self.assertEqual(image.size, (width, width // 2))
+
+    def test_variant_paths(self):
+        """Пути вариантов не совпадают у разных постов и расширений."""
+        first = Post.objects.create(
+            text='Текст', author=self.user, image=make_image('image.png')
+        )
+        second = Post.objects.create(
+            text='Текст', author=self.user, image=make_image('image.png')
+        )
+        third = Post.objects.create(
+            text='Текст', author=self.user, image=make_photo('image.jpg')
+        )
+        urls = []
+        for post in (first, second, third):
+            post.refresh_from_db()
+            urls += [url for _, url in post.image_variants['card']['webp']]
+        self.assertEqual(len(urls), len(set(urls)))
+        for url in urls:
+            self.assertTrue(os.path.exists(self.get_path(url)))
+
+    def test_image_change_deletes_variants(self):
+        """При замене и удалении картинки прежние варианты удаляются."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_photo()
+        )
+        post.refresh_from_db()
+        old_paths = [
+            self.get_path(url)
+            for formats in post.image_variants.values()
+            for variants in formats.values()
+            for _, url in variants
+        ]
+        post.image = make_image()
+        post.save()
+        post.refresh_from_db()
+        for path in old_paths:
+            self.assertFalse(os.path.exists(path))
+        new_paths = [
+            self.get_path(url)
+            for _, url in post.image_variants['card']['webp']
+        ]
+        post.image = None
+        post.save()
+        for path in new_paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_regeneration_keeps_other_files(self):
+        """Повторная подготовка удаляет только записанные варианты."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_image()
+        )
+        post.refresh_from_db()
+        old_paths = [
+            self.get_path(url)
+            for _, url in post.image_variants['card']['webp']
+        ]
+        other = os.path.join(os.path.dirname(old_paths[0]), 'other.webp')
+        with open(other, 'wb') as file:
+            file.write(b'data')
+        call_command('generate_thumbnails', all=True, stdout=io.StringIO())
+        post.refresh_from_db()
+        for path in old_paths:
+            self.assertFalse(os.path.exists(path))
+        for _, url in post.image_variants['card']['webp']:
+            self.assertTrue(os.path.exists(self.get_path(url)))
+        self.assertTrue(os.path.exists(other))
+
+    def test_variants_in_templates_and_api(self):
+        """Варианты выводятся в srcset карточки и в API."""
+        post = Post.objects.create(
+            text='Текст', author=self.user, image=make_photo()
+        )
+        post.refresh_from_db()
+        url = post.image_variants['card']['webp'][0][1]
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'{url} 320w')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'sizes="')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        url = post.image_variants['detail']['webp'][0][1]
+        self.assertContains(response, f'{url} 320w')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/v1/posts/{post.pk}/')
+        variant = response.json()['image_variants']['card']['webp'][0]
+        self.assertEqual(variant['width'], 320)
+        self.assertTrue(
+            variant['url'].endswith(post.image_variants['card']['webp'][0][1])
+        )
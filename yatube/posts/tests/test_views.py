@@ -7,7 +7,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
-from posts.models import Post, Group
+from posts.models import Follow, Post, Group
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -207,13 +207,81 @@ class PostViewTest(TestCase):
         )
         response_1 = self.authorized_client.get(reverse('posts:index'))
         self.assertIn(post.text, response_1.content.decode())
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Новый текст')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertIn(post.text, response_2.content.decode())
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
         self.assertNotIn(post.text, response_3.content.decode())
 
+    def test_post_cache_invalidation(self):
+        """Кэш списков постов сбрасывается при изменении постов."""
+        group = Group.objects.create(title='Кэш группа', slug='cache-group')
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, following=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        post = Post.objects.create(
+            text='Кэш пост',
+            author=self.user,
+            group=group
+        )
+        pages = (
+            (self.authorized_client, reverse('posts:index')),
+            (self.authorized_client,
+             reverse('posts:group_list', kwargs={'slug': group.slug})),
+            (self.authorized_client,
+             reverse('posts:profile', kwargs={'username': self.user})),
+            (reader_client, reverse('posts:follow_index')),
+        )
+        for client, url in pages:
+            client.get(url)
+        post.text = 'Новый текст'
+        post.save()
+        for client, url in pages:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertIn('Новый текст', response.content.decode())
+        post.group = None
+        post.save()
+        response = self.authorized_client.get(pages[1][1])
+        self.assertNotIn('Новый текст', response.content.decode())
+        post.delete()
+        for client, url in pages:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertNotIn('Новый текст', response.content.decode())
+
+    def test_rename_invalidates_cards(self):
+        """Кэш списков сбрасывается при смене названия группы и имени
+        автора."""
+        group = Group.objects.create(title='Старая группа', slug='rename')
+        Post.objects.create(text='Пост', author=self.user, group=group)
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, following=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        pages = (
+            (self.authorized_client, reverse('posts:index')),
+            (self.authorized_client,
+             reverse('posts:group_list', kwargs={'slug': group.slug})),
+            (self.authorized_client,
+             reverse('posts:profile', kwargs={'username': self.user})),
+            (reader_client, reverse('posts:follow_index')),
+        )
+        for client, url in pages:
+            client.get(url)
+        group.title = 'Новая группа'
+        group.save()
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        for client, url in pages:
+            with self.subTest(url=url):
+                content = client.get(url).content.decode()
+                self.assertIn('Новая группа', content)
+                self.assertIn('Новое Имя', content)
+
     def test_authorized_user_can_follow_and_unfollow(self):
         """Авторизованный пользователь может подписываться и отписываться."""
         user = User.objects.get(username='testuser')
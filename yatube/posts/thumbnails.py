@@ -0,0 +1,247 @@
+import io
+import logging
+import os
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+
+from core.cache import bump_generation
+from core.tasks import run_after_commit
+from .feed import follower_scopes
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailName(Exception):
+    """
+    Имя файла миниатюры, вычисленное get_thumbnail.
+    """
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """
+    Бэкенд sorl-thumbnail, умеющий вычислять файл миниатюры без
+    обращения к хранилищу ключей и к картинке.
+
+    Используется только для имен: get_thumbnail прерывается, как только
+    имя файла вычислено.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        raise ThumbnailName(
+            super()._get_thumbnail_filename(source, geometry_string, options)
+        )
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """
+        Возвращает файл миниатюры, который создал бы get_thumbnail.
+        """
+        try:
+            self.get_thumbnail(file_, geometry_string, **options)
+        except ThumbnailName as name:
+            return ImageFile(str(name), default.storage)
+
+
+backend = ThumbnailBackend()
+
+
+def build_thumbnails(image):
+    """
+    Готовит все миниатюры THUMBNAIL_SIZES для картинки и возвращает
+    их адреса по названиям размеров.
+    """
+    return {
+        name: get_thumbnail(image, geometry, **options).url
+        for name, (geometry, options) in settings.THUMBNAIL_SIZES.items()
+    }
+
+
+def get_variants_dir(post_id):
+    """
+    Возвращает каталог вариантов картинки поста в хранилище.
+    """
+    return f'posts/variants/{post_id}'
+
+
+def get_variant_names(variants, storage):
+    """
+    Возвращает имена в хранилище storage файлов вариантов variants
+    ({размер: {формат: [[ширина, адрес], ...]}}) из каталогов вариантов.
+    """
+    prefix = storage.url(get_variants_dir(''))
+    return [
+        unquote(url[len(storage.base_url):])
+        for formats in variants.values()
+        for items in formats.values()
+        for _, url in items
+        if url.startswith(prefix)
+    ]
+
+
+def delete_variants(variants):
+    """
+    Удаляет файлы вариантов variants, записанных в посте (image_variants).
+
+    Удаляются только перечисленные файлы, а не весь каталог поста.
+    """
+    storage = Post._meta.get_field('image').storage
+    for name in get_variant_names(variants, storage):
+        storage.delete(name)
+
+
+def get_crop_box(image, geometry, options):
+    """
+    Возвращает область картинки, которую оставляет миниатюра geometry
+    с options: при crop - середину с соотношением сторон миниатюры,
+    иначе None (картинка целиком).
+    """
+    if not options.get('crop'):
+        return None
+    width, height = (int(side) for side in geometry.split('x'))
+    if image.width * height > image.height * width:
+        cropped = round(image.height * width / height)
+        left = (image.width - cropped) // 2
+        return (left, 0, left + cropped, image.height)
+    cropped = round(image.width * height / width)
+    top = (image.height - cropped) // 2
+    return (0, top, image.width, top + cropped)
+
+
+def save_variants(frame, path, storage):
+    """
+    Сохраняет кадр frame в хранилище storage по пути path-{ширина}w.{формат}
+    в каждой ширине из IMAGE_VARIANT_WIDTHS меньше ширины кадра и в ширине
+    самого кадра, если он не шире наибольшей, в каждом формате из
+    IMAGE_VARIANT_FORMATS.
+
+    Возвращает {формат: [[ширина, адрес], ...]}.
+    """
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS
+              if width < frame.width]
+    if len(widths) < len(settings.IMAGE_VARIANT_WIDTHS):
+        widths.append(frame.width)
+    variants = {}
+    for name, options in settings.IMAGE_VARIANT_FORMATS.items():
+        variants[name] = []
+        for width in widths:
+            height = max(1, round(frame.height * width / frame.width))
+            resized = frame.resize((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, name.upper(), **options)
+            saved = storage.save(
+                f'{path}-{width}w.{name}', ContentFile(buffer.getvalue())
+            )
+            variants[name].append([width, storage.url(saved)])
+    return variants
+
+
+def build_variants(post):
+    """
+    Готовит варианты картинки поста для srcset каждого размера из
+    THUMBNAIL_SIZES, кадрируя их так же, как миниатюру этого размера.
+
+    Метаданные EXIF не сохраняются, ориентация из EXIF применяется
+    к пикселям. Файлы пишутся в каталог поста под новыми именами,
+    прежние варианты удаляет generate.
+
+    Возвращает {размер: {формат: [[ширина, адрес], ...]}}.
+    """
+    image = post.image
+    prefix = (f'{get_variants_dir(post.pk)}/'
+              f'{os.path.basename(image.name)}')
+    with image.open('rb'), Image.open(image) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands()
+                                    or 'transparency' in source.info
+                                    else 'RGB')
+        variants = {}
+        for size, (geometry, options) in settings.THUMBNAIL_SIZES.items():
+            box = get_crop_box(source, geometry, options)
+            frame = source.crop(box) if box else source
+            variants[size] = save_variants(
+                frame, f'{prefix}-{size}', image.storage
+            )
+    return variants
+
+
+def resolve_thumbnails(posts):
+    """
+    Дополняет миниатюры постов страницы из хранилища ключей sorl.
+
+    Для постов с картинкой, у которых адреса миниатюр еще не сохранены,
+    готовые миниатюры ищутся одним пакетным запросом вместо отдельного
+    поиска на каждый пост. Ненайденные размеры остаются пустыми.
+    """
+    wanted = {}
+    for post in posts:
+        if not post.image:
+            continue
+        for name, (geometry, options) in settings.THUMBNAIL_SIZES.items():
+            if name not in post.thumbnails:
+                wanted[post, name] = backend.get_thumbnail_file(
+                    post.image, geometry, **options
+                )
+    if not wanted:
+        return
+    found = default.kvstore.get_many(wanted.values())
+    for (post, name), image_file in wanted.items():
+        if image_file.key in found:
+            post.thumbnails[name] = found[image_file.key].url
+
+
+def generate(post_id, stale=None):
+    """
+    Готовит миниатюры и варианты картинки поста и сохраняет их адреса
+    в посте.
+
+    После сохранения удаляются прежние варианты: записанные в посте
+    и stale - варианты замененной картинки, сброшенные при ее замене.
+    Если картинку успели заменить, результат отбрасывается вместе
+    с новыми файлами: миниатюры новой картинки готовит следующая задача.
+    Если картинку удалили, удаляются только прежние варианты.
+    """
+    post = (Post.objects.filter(pk=post_id)
+            .only('image', 'author', 'group', 'image_variants').first())
+    if post is None:
+        return
+    previous = (stale or {}, post.image_variants)
+    if not post.image:
+        for variants in previous:
+            delete_variants(variants)
+        return
+    try:
+        thumbnails = build_thumbnails(post.image)
+        variants = build_variants(post)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s', post_id)
+        return
+    updated = Post.objects.filter(
+        pk=post_id, image=post.image.name
+    ).update(thumbnails=thumbnails, image_variants=variants)
+    if not updated:
+        delete_variants(variants)
+        return
+    for old in previous:
+        delete_variants(old)
+    bump_generation(
+        *post.cache_scopes(), *follower_scopes((post.author_id,))
+    )
+
+
+def schedule(post, stale=None):
+    """
+    Ставит подготовку миниатюр поста в очередь после фиксации транзакции.
+    stale - варианты прежней картинки, которые удаляются после подготовки.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры готовятся сразу, в текущем потоке.
+    """
+    run_after_commit(
+        'thumbnails', settings.THUMBNAIL_WORKERS, generate, post.pk, stale
+    )
@@ -1,31 +1,53 @@
+from functools import partial
+
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
+from django.urls import reverse
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Post, Group, User, Comment, Follow, Tag
 from .forms import PostForm, CommentForm
+from .comments import comment_data, get_comments_page, get_threads
+from .counters import get_posts_count
+from .feed import (FEED_ORDERING, get_feed, get_feed_scopes,
+                   get_followed_celebrities)
+from .paginator import get_lazy_page
+from .search import search
+from .tags import TAG_ORDERING, get_tag_cloud, get_tag_posts
+from .thumbnails import resolve_thumbnails
 
 
 def index(request):
     """
     Представление для главной страницы сайта.
 
-    Отображает список всех постов, поддерживает поиск по ключевому слову.
+    Отображает список всех постов, поддерживает полнотекстовый поиск
+    по ключевому слову с сортировкой по релевантности.
     """
     template = 'posts/index.html'
     keyword = request.GET.get('q', None)
-    page_number = request.GET.get('page', None)
     if keyword:
-        posts = (Post.objects.filter(text__contains=keyword)
-                 .select_related('author')
-                 .select_related('group'))
+        posts = search(Post.objects.for_cards(), keyword)
+        page_obj = get_lazy_page(
+            request,
+            posts,
+            prepare=resolve_thumbnails,
+            ordering=('search_rank', '-pk'),
+            exact_count=False
+        )
     else:
-        posts = Post.objects.all()
-    paginator = Paginator(posts, 10)
-    page_obj = paginator.get_page(page_number)
+        posts = Post.objects.for_cards()
+        page_obj = get_lazy_page(
+            request,
+            posts,
+            prepare=resolve_thumbnails,
+            count_cache_key='posts:index'
+        )
     context = {
         'page_obj': page_obj,
         'keyword': keyword,
+        'cache_scope': 'index',
     }
     return render(request, template, context)
 
@@ -38,13 +60,53 @@ def group_posts(request, slug):
     """
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    page_number = request.GET.get('page')
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, 10)
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.filter(group=group).for_cards()
+    page_obj = get_lazy_page(
+        request,
+        posts,
+        prepare=resolve_thumbnails,
+        count_cache_key=f'posts:group:{group.pk}'
+    )
     context = {
         'page_obj': page_obj,
         'group': group,
+        'cache_scope': f'group:{group.pk}',
+    }
+    return render(request, template, context)
+
+
+def tag_list(request):
+    """
+    Представление для облака тегов.
+
+    Отображает самые популярные теги по количеству постов.
+    """
+    template = 'posts/tag_list.html'
+    context = {
+        'tags': get_tag_cloud(),
+    }
+    return render(request, template, context)
+
+
+def tag_posts(request, name):
+    """
+    Представление для отображения постов с определенным тегом.
+
+    Количество постов берется из счетчика тега.
+    """
+    template = 'posts/tag_posts.html'
+    tag = get_object_or_404(Tag, name=name)
+    page_obj = get_lazy_page(
+        request,
+        get_tag_posts(tag).for_cards(),
+        prepare=resolve_thumbnails,
+        ordering=TAG_ORDERING,
+        count=tag.posts_count
+    )
+    context = {
+        'page_obj': page_obj,
+        'tag': tag,
+        'cache_scope': ['index', f'tag:{tag.pk}'],
     }
     return render(request, template, context)
 
@@ -65,14 +127,19 @@ def profile(request, username):
         ).exists()
     else:
         following = None
-    posts = author.posts.all()
-    page = request.GET.get('page')
-    paginator = Paginator(posts, 10)
-    page_obj = paginator.get_page(page)
+    posts = author.posts.for_cards()
+    page_obj = get_lazy_page(
+        request,
+        posts,
+        prepare=resolve_thumbnails,
+        count_cache_key=f'posts:profile:{author.pk}'
+    )
     context = {
         'author': author,
+        'posts_count': get_posts_count(author),
         'following': following,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_scope': f'profile:{author.pk}',
     }
     return render(request, template_name, context)
 
@@ -81,18 +148,88 @@ def post_detail(request, post_id):
     """
     Представление для отображения деталей поста.
 
-    Отображает полный текст поста и комментарии к нему.
+    Отображает полный текст поста и первую страницу веток комментариев
+    к нему (или страницу по курсору cursor). Комментарии и ответы веток
+    читаются только при отрисовке, если их фрагмент не найден в кэше.
     """
     template_name = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.with_tags(), pk=post_id)
+    resolve_thumbnails((post,))
     form = CommentForm()
-    comments = Comment.objects.filter(post=post)
-    paginator = Paginator(comments, 10)
-    page_obj = paginator.get_page(request.GET)
+    page_obj = get_comments_page(request, post, lazy=True)
     context = {
         'post': post,
+        'posts_count': get_posts_count(post.author),
         'form': form,
         'page_obj': page_obj,
+        'comments': partial(
+            get_threads, page_obj, settings.COMMENT_THREAD_DEPTH
+        ),
+        'thread_depth': settings.COMMENT_THREAD_DEPTH,
+        'cache_scope': f'post:{post.pk}',
+    }
+    return render(request, template_name, context)
+
+
+def post_comments(request, post_id):
+    """
+    Представление для подгрузки комментариев поста («Показать еще»).
+
+    Возвращает страницу веток комментариев по курсору cursor фрагментом
+    HTML, а при format=json - в JSON со ссылкой next на следующую
+    страницу и общим числом комментариев count.
+    """
+    template_name = 'posts/includes/comment_list.html'
+    post = get_object_or_404(
+        Post.objects.only('pk', 'comments_count'), pk=post_id
+    )
+    as_json = request.GET.get('format') == 'json'
+    page_obj = get_comments_page(request, post, lazy=not as_json)
+    depth = settings.COMMENT_THREAD_DEPTH
+    if as_json:
+        next_url = None
+        if page_obj.has_next():
+            next_url = request.build_absolute_uri(
+                reverse('posts:post_comments', args=(post.pk,))
+                + f'?format=json&cursor={page_obj.next_cursor}'
+            )
+        return JsonResponse({
+            'count': post.comments_count,
+            'next': next_url,
+            'results': [comment_data(comment)
+                        for comment in get_threads(page_obj, depth)],
+        })
+    context = {
+        'post': post,
+        'page_obj': page_obj,
+        'comments': partial(get_threads, page_obj, depth),
+        'thread_depth': depth,
+        'cache_scope': f'post:{post.pk}',
+    }
+    return render(request, template_name, context)
+
+
+def comment_thread(request, post_id, comment_id):
+    """
+    Представление для отображения ветки комментария.
+
+    Отображает комментарий и ответы на него не глубже COMMENT_THREAD_DEPTH
+    уровней (ответы читаются одним запросом) и форму ответа.
+    """
+    template_name = 'posts/comment_thread.html'
+    comment = get_object_or_404(
+        Comment.objects.select_related('author', 'post'),
+        pk=comment_id,
+        post_id=post_id
+    )
+    depth = settings.COMMENT_THREAD_DEPTH
+    context = {
+        'post': comment.post,
+        'comment': comment,
+        'comments': get_threads((comment,), depth),
+        'thread_depth': depth,
+        'form': CommentForm(),
+        'reply_to': comment,
     }
     return render(request, template_name, context)
 
@@ -154,14 +291,20 @@ def add_comment(request, post_id):
     """
     Представление для добавления комментария к посту.
 
-    Доступно только для авторизованных пользователей.
+    Доступно только для авторизованных пользователей. Параметр parent
+    задает комментарий того же поста, на который дается ответ.
     """
     post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm(request.POST or None)
+    parent = None
+    parent_id = request.POST.get('parent', '')
+    if parent_id.isdigit():
+        parent = get_object_or_404(Comment, pk=parent_id, post=post)
+    form = CommentForm(
+        request.POST or None, instance=Comment(post=post, parent=parent)
+    )
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
-        comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
@@ -174,12 +317,18 @@ def follow_index(request):
     Доступно только для авторизованных пользователей.
     """
     template_name = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_number = request.GET.get('page')
-    paginator = Paginator(posts, 10)
-    page_obj = paginator.get_page(page_number)
+    celebrities = get_followed_celebrities(request.user)
+    posts = get_feed(request.user, celebrities).for_cards()
+    page_obj = get_lazy_page(
+        request,
+        posts,
+        prepare=resolve_thumbnails,
+        ordering=FEED_ORDERING,
+        exact_count=False
+    )
     context = {
         'page_obj': page_obj,
+        'cache_scope': get_feed_scopes(request.user, celebrities),
     }
     return render(request, template_name, context)
 
@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -64,6 +65,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -169,18 +171,165 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 
-CACHED = {
+# Кэш: бэкенд выбирается переменной окружения CACHE_BACKEND
+# (locmem, file, memcached - через pymemcache или redis - через
+# django-redis).
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'Неизвестный CACHE_BACKEND {CACHE_BACKEND!r}, допустимые значения: '
+        f'{", ".join(CACHE_BACKENDS)}'
+    )
+
+CACHE_DEFAULT_TIMEOUT = 60 * 5
+
+CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        'TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.getenv('CACHE_VERSION', 1)),
     }
 }
 
+# Пространства имен кэша: ALIAS, TIMEOUT и VERSION ключей.
+
+CACHE_NAMESPACES = {
+    'post_list': {'TIMEOUT': 60 * 60 * 24},
+    'comments': {'TIMEOUT': 60 * 60 * 24},
+    'generations': {'TIMEOUT': None},
+    'counts': {'TIMEOUT': 60},
+    'tags': {'TIMEOUT': 60 * 60},
+}
+
+# Счетчики попаданий и промахов добавляют обращение к кэшу на каждое
+# чтение, поэтому включаются явно.
+
+CACHE_METRICS = os.getenv('CACHE_METRICS', 'false').lower() == 'true'
+
+# Метрики запросов: число и время SQL, обращения к кэшу и время шаблонов
+# по представлениям. Учет времени шаблонов подменяет Template.render,
+# а заголовок Server-Timing раскрывает время ответа клиентам, поэтому
+# они включаются явно. QUERY_BUDGETS задает допустимое число SQL-запросов
+# представления при чтении (GET, HEAD, OPTIONS), QUERY_BUDGET_ACTION -
+# реакцию на превышение: 'log' или 'raise'.
+
+REQUEST_METRICS = os.getenv('REQUEST_METRICS', 'true').lower() == 'true'
+REQUEST_METRICS_TEMPLATES = (
+    os.getenv('REQUEST_METRICS_TEMPLATES', 'false').lower() == 'true'
+)
+REQUEST_METRICS_WINDOW = 1000
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+
+QUERY_BUDGETS = {
+    'api:post-list': 10,
+    'api:post-detail': 10,
+    'api:comment-list': 10,
+    'posts:index': 8,
+    'posts:group_list': 8,
+    'posts:profile': 10,
+    'posts:follow_index': 8,
+    'posts:tag_posts': 8,
+    'posts:tag_list': 5,
+    'posts:post_detail': 10,
+    'posts:post_comments': 5,
+}
+QUERY_BUDGET_ACTION = os.getenv('QUERY_BUDGET_ACTION', 'log')
+
+
+# Миниатюры картинок постов: размеры для шаблонов (название: геометрия
+# и параметры sorl-thumbnail) и число потоков, которые их готовят после
+# фиксации транзакции загрузки. При THUMBNAIL_WORKERS = 0 миниатюры
+# готовятся при сохранении.
+# Хранилище ключей sorl-thumbnail читает миниатюры страницы одним запросом.
+
+THUMBNAIL_SIZES = {
+    'card': ('200x100', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'upscale': True}),
+}
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+
+# Варианты картинок постов для srcset: готовятся для каждого размера
+# THUMBNAIL_SIZES с тем же кадрированием, в ширинах и форматах
+# с параметрами сохранения (пресеты качества).
+
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280)
+IMAGE_VARIANT_FORMATS = {
+    'webp': {'quality': 75, 'method': 6},
+}
+
+# Загрузка картинок: файлы полей IMAGE_UPLOAD_FIELDS проверяются по
+# заголовку до получения всего файла (формат, число пикселей, размер),
+# копятся в памяти до FILE_UPLOAD_MAX_MEMORY_SIZE, затем на диске,
+# теряют метаданные (EXIF, XMP) и уменьшаются до IMAGE_UPLOAD_MAX_SIDE
+# по большей стороне.
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandler.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_FIELDS = ('image',)
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+IMAGE_UPLOAD_MAX_SIDE = 2560
+IMAGE_UPLOAD_SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
 
+# Лента подписок: авторы, у которых подписчиков больше FEED_FANOUT_LIMIT,
+# не раскладываются по лентам при публикации, а читаются при запросе.
+# При FEED_WORKERS > 0 посты раскладываются в фоне после фиксации
+# транзакции, иначе при сохранении, и подписчик видит пост сразу.
+
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 1000
+FEED_BATCH_SIZE = 500
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', 0))
+
+
+# Ветки комментариев: наибольшая глубина ответов (не больше
+# Comment.PATH_MAX_DEPTH) и число уровней ответов, показываемых под
+# комментарием на странице поста.
+
+COMMENT_MAX_DEPTH = 20
+COMMENT_THREAD_DEPTH = 3
+
+
+# Облако тегов: число самых популярных тегов в облаке.
+
+TAG_CLOUD_SIZE = 50
+
+
+# Пагинация
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+# Пакетные запросы API: наибольшее число объектов в одном запросе.
+
+API_BATCH_MAX_SIZE = 100
+
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated'
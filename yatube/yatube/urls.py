@@ -18,6 +18,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import request_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
@@ -25,6 +27,7 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
     path('api/', include('api.urls', namespace='api')),
+    path('metrics/', request_metrics, name='request_metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'